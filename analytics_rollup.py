@@ -0,0 +1,91 @@
+"""
+Analytics Rollup - Background refresh of the hourly rollups and a cached summary
+
+/api/analytics reads the rollup tables instead of scanning users, matches and
+analytics; summaries are cached (in-process and Redis) for a short TTL.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Any, Optional
+
+from cache import TieredCache
+
+
+class AnalyticsRollup:
+    def __init__(self, database, redis_store):
+        self.database = database
+        self.refresh_interval = int(os.getenv('ANALYTICS_ROLLUP_INTERVAL', 60))
+        self.rebuild_interval = int(os.getenv('ANALYTICS_ROLLUP_REBUILD_INTERVAL', 86400))
+        self.summary_ttl = int(os.getenv('ANALYTICS_SUMMARY_TTL', 60))
+        
+        self.cache = TieredCache(redis_store, max_entries=32)
+        self._loop_task: Optional[asyncio.Task] = None
+        self._last_rebuild: Optional[float] = None
+        self._stats = {
+            'refreshes': 0,
+            'rebuilds': 0,
+            'refresh_errors': 0,
+            'refresh_time_total': 0.0
+        }
+    
+    async def refresh(self, full: bool = False) -> None:
+        """Bring the rollups up to date (full=True rebuilds every bucket)"""
+        started = time.perf_counter()
+        try:
+            await self.database.refresh_analytics_rollups(full=full)
+        finally:
+            self._stats['refresh_time_total'] += time.perf_counter() - started
+        
+        if full:
+            self._stats['rebuilds'] += 1
+            self._last_rebuild = time.monotonic()
+        else:
+            self._stats['refreshes'] += 1
+    
+    async def get_summary(self, days: int = 7) -> Dict[str, Any]:
+        """Analytics summary for the past N days, cached for summary_ttl seconds"""
+        key = f"analytics_summary:{days}"
+        hit, summary = await self.cache.get(key)
+        if hit:
+            return summary
+        
+        summary = await self.database.get_analytics_summary(days=days)
+        await self.cache.set(key, summary, self.summary_ttl)
+        return summary
+    
+    def start(self) -> None:
+        """Start the periodic background refresh"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+    
+    async def _run(self) -> None:
+        while True:
+            if self.database.pool is not None:
+                # Rebuild once at startup (catches up on any history) and then daily
+                full = (self._last_rebuild is None or
+                        time.monotonic() - self._last_rebuild >= self.rebuild_interval)
+                try:
+                    await self.refresh(full=full)
+                except Exception as e:
+                    print(f"Analytics rollup refresh failed: {e}")
+                    self._stats['refresh_errors'] += 1
+            await asyncio.sleep(self.refresh_interval)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        runs = self._stats['refreshes'] + self._stats['rebuilds']
+        return {
+            **self._stats,
+            'running': self._loop_task is not None,
+            'summary_cache': self.cache.get_stats()['kinds'].get('analytics_summary', {}),
+            'avg_refresh_ms': round(self._stats['refresh_time_total'] / runs * 1000, 3) if runs else 0.0
+        }
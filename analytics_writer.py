@@ -0,0 +1,195 @@
+"""
+Analytics Writer - Buffered, non-blocking analytics event logging
+
+Endpoints enqueue events without awaiting the database; a background flusher
+writes them to the analytics table with COPY in batches (by size or time).
+created_at is filled in by the database at flush time, so it can lag the
+event by up to one flush interval.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+Event = Tuple[str, int, Dict[str, Any]]
+
+
+class AnalyticsWriter:
+    def __init__(self, database, max_queue: Optional[int] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 spill_path: Optional[str] = None):
+        self.database = database
+        self.max_queue = max_queue or int(os.getenv('ANALYTICS_QUEUE_SIZE', 10000))
+        self.batch_size = batch_size or int(os.getenv('ANALYTICS_BATCH_SIZE', 500))
+        self.flush_interval = flush_interval or float(os.getenv('ANALYTICS_FLUSH_INTERVAL', 2.0))
+        # Empty ANALYTICS_SPILL_PATH disables spilling: overflow is dropped instead
+        self.spill_path = spill_path if spill_path is not None else os.getenv(
+            'ANALYTICS_SPILL_PATH', 'data/analytics_spill.jsonl'
+        )
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'dropped': 0,
+            'flush_errors': 0,
+            'flush_time_total': 0.0
+        }
+    
+    def log(self, event_type: str, fid: int, event_data: Dict[str, Any]) -> bool:
+        """Queue an event without waiting; False if it had to be spilled or dropped"""
+        if self._queue is None or self.database.pool is None:
+            self._stats['dropped'] += 1
+            return False
+        
+        try:
+            self._queue.put_nowait((event_type, fid, event_data))
+        except asyncio.QueueFull:
+            self._overflow([(event_type, fid, event_data)])
+            return False
+        
+        self._stats['enqueued'] += 1
+        return True
+    
+    def start(self) -> None:
+        """Start the background flusher (replaying any spilled events first)"""
+        if self._task is not None:
+            return
+        
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._stopping = asyncio.Event()
+        self._replay_spill()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the flusher and drain everything still queued"""
+        if self._task is None:
+            return
+        
+        # Not cancelled: the flusher writes (or spills) the batch it holds, then exits
+        self._stopping.set()
+        await self._task
+        self._task = None
+        
+        while not self._queue.empty():
+            await self._flush(self._take_batch())
+        self._queue = None
+    
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = await self._collect_batch()
+            await self._flush(batch)
+    
+    async def _collect_batch(self) -> List[Event]:
+        """Wait for the first event, then gather until batch_size, flush_interval or stop()"""
+        first = await self._next_event(None)
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = await self._next_event(remaining)
+            if event is None:
+                break
+            batch.append(event)
+        return batch
+    
+    async def _next_event(self, timeout: Optional[float]) -> Optional[Event]:
+        """The next queued event, or None after timeout or once stop() is called"""
+        if self._stopping.is_set():
+            return None
+        
+        getter = asyncio.ensure_future(self._queue.get())
+        stopper = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait({getter, stopper}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        stopper.cancel()
+        if getter.done():
+            return getter.result()
+        # A cancelled get leaves its item in the queue for the final drain
+        getter.cancel()
+        return None
+    
+    def _take_batch(self) -> List[Event]:
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+    
+    async def _flush(self, batch: List[Event]) -> None:
+        if not batch:
+            return
+        
+        started = time.perf_counter()
+        try:
+            async with self.database.pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    'analytics',
+                    records=batch,
+                    columns=['event_type', 'fid', 'event_data']
+                )
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+        except asyncio.CancelledError:
+            # Cancelled mid-COPY (e.g. by the server): keep the batch for the next run
+            self._overflow(batch)
+            raise
+        except Exception as e:
+            print(f"Analytics flush failed ({len(batch)} events): {e}")
+            self._stats['flush_errors'] += 1
+            self._overflow(batch)
+        finally:
+            self._stats['flush_time_total'] += time.perf_counter() - started
+    
+    def _overflow(self, events: List[Event]) -> None:
+        """Spill events to the local file, or count them as dropped"""
+        if self.spill_path:
+            try:
+                os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for event in events:
+                        f.write(json.dumps(event, default=str) + '\n')
+                self._stats['spilled'] += len(events)
+                return
+            except Exception as e:
+                print(f"Analytics spill failed: {e}")
+        
+        self._stats['dropped'] += len(events)
+    
+    def _replay_spill(self) -> None:
+        """Queue events spilled by a previous run (as many as fit)"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        
+        with open(self.spill_path, 'r', encoding='utf-8') as f:
+            events = [tuple(json.loads(line)) for line in f if line.strip()]
+        os.remove(self.spill_path)
+        
+        for i, event in enumerate(events):
+            try:
+                self._queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._overflow(events[i:])
+                break
+            self._stats['replayed'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        batches = self._stats['batches']
+        return {
+            **self._stats,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'running': self._task is not None,
+            'avg_flush_ms': round(self._stats['flush_time_total'] / batches * 1000, 3) if batches else 0.0
+        }
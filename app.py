@@ -12,15 +12,24 @@ from dotenv import load_dotenv
 
 # Import our modules
 from database import db
+from redis_store import redis_store
+from rate_limiter import create_rate_limiter
+from analytics_writer import AnalyticsWriter
+from analytics_rollup import AnalyticsRollup
 from matching_algorithm.matchmaker import MatchmakerAI
 from frame_generator.frame_builder import FrameGenerator
-from comedy_generator import ComedyGenerator
+from frame_generator.image_renderer import ImageRenderer
+from frame_generator.static_frames import StaticFrames
+from http_cache import IMMUTABLE_CACHE_CONTROL, cached_response, etag_matches
+from static_images import StaticImageCache
 
 load_dotenv()
 
 # Initialize components
-matchmaker = MatchmakerAI(use_mock_data=True)  # Change to False when you have real API keys
-comedy_gen = ComedyGenerator()
+matchmaker = MatchmakerAI(use_mock_data=True, database=db)  # Change to False when you have real API keys
+rate_limiter = create_rate_limiter(db, redis_store)
+analytics = AnalyticsWriter(db)
+analytics_rollup = AnalyticsRollup(db, redis_store)
 
 # Get base URL from environment - Vercel auto-detection
 BASE_URL = os.getenv('BASE_URL')
@@ -34,12 +43,25 @@ if not BASE_URL:
 
 print(f"🌐 Using BASE_URL: {BASE_URL}")
 frame_generator = FrameGenerator(BASE_URL)
+image_renderer = ImageRenderer()
+
+# The manifest prefers the Vercel deployment URL over BASE_URL
+vercel_url = os.getenv('VERCEL_URL')
+if vercel_url:
+    MANIFEST_URL = f'https://{vercel_url}' if not vercel_url.startswith('http') else vercel_url
+else:
+    MANIFEST_URL = BASE_URL
+static_frames = StaticFrames(frame_generator, MANIFEST_URL)
+static_images = StaticImageCache('static/images')
 
 # Lifespan context manager for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Crypto Compatibility Engine...")
+    static_frames.build()
+    print(f"✅ Static frames and manifest prebuilt for {MANIFEST_URL}")
+    
     try:
         await db.connect()
         print("✅ Database connected")
@@ -47,10 +69,35 @@ async def lifespan(app: FastAPI):
         print(f"⚠️  Database connection failed: {e}")
         print("📝 Running without database (demo mode)")
     
+    try:
+        await redis_store.connect()
+        print("✅ Redis connected")
+    except Exception as e:
+        print(f"⚠️  Redis connection failed: {e}")
+        print("📝 Running with in-process cache only")
+    
+    await matchmaker.farcaster_client.start()
+    print("✅ Farcaster connection pool ready")
+    
+    matchmaker.candidate_pool.start()
+    analytics.start()
+    analytics_rollup.start()
+    image_renderer.start()
+    
     yield
     
     # Shutdown
     print("👋 Shutting down...")
+    await matchmaker.candidate_pool.stop()
+    await matchmaker.comedy_generator.close()
+    await analytics_rollup.stop()
+    await analytics.stop()
+    image_renderer.close()
+    await matchmaker.farcaster_client.close()
+    try:
+        await redis_store.disconnect()
+    except:
+        pass
     try:
         await db.disconnect()
     except:
@@ -125,14 +172,9 @@ async def options_handler(path: str):
 # ============================================================================
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Main entry point - initial frame"""
-    frame_data = frame_generator.generate_start_frame()
-    html = frame_generator.generate_frame_html(
-        frame_data,
-        title="🚀 Find Your Crypto Soulmate!"
-    )
-    return HTMLResponse(content=html)
+    return static_frames.response('start', request)
 
 
 @app.post("/api/analyze")
@@ -151,11 +193,9 @@ async def analyze_personality(request: Request):
         
         # Check rate limit
         try:
-            within_limit = await db.check_rate_limit(fid)
+            within_limit = await rate_limiter.check(fid)
             if not within_limit:
-                return JSONResponse(
-                    content=frame_generator.generate_rate_limit_frame()
-                )
+                return static_frames.response('rate_limit')
         except:
             pass  # Continue if database is not available
         
@@ -170,14 +210,14 @@ async def analyze_personality(request: Request):
                 personality_type=analysis['personality_type'],
                 personality_scores=analysis['scores']
             )
-            
-            # Log analytics
-            await db.log_analytics('personality_analyzed', fid, {
-                'personality_type': analysis['personality_type']
-            })
         except:
             pass  # Continue if database is not available
         
+        # Log analytics (buffered, flushed in the background)
+        analytics.log('personality_analyzed', fid, {
+            'personality_type': analysis['personality_type']
+        })
+        
         # Generate result frame
         frame_data = frame_generator.generate_personality_result_frame(analysis)
         return JSONResponse(content=frame_data)
@@ -208,25 +248,19 @@ async def find_matches(request: Request):
         matches = await matchmaker.find_matches(fid, limit=5)
         
         if not matches:
-            return JSONResponse(
-                content=frame_generator.generate_no_matches_frame()
-            )
+            return static_frames.response('no_matches')
         
-        # Save matches to database
+        # Save matches and the analytics event in one transaction
         try:
-            for match in matches:
-                await db.save_match(
-                    user_fid=fid,
-                    match_fid=match['match_fid'],
-                    compatibility_score=match['compatibility_score'],
-                    match_details=match
-                )
-            
-            # Log analytics
-            await db.log_analytics('matches_found', fid, {
-                'match_count': len(matches),
-                'top_score': matches[0]['compatibility_score']
-            })
+            await db.save_matches_bulk(
+                fid,
+                matches,
+                analytics_event='matches_found',
+                analytics_data={
+                    'match_count': len(matches),
+                    'top_score': matches[0]['compatibility_score']
+                }
+            )
         except:
             pass
         
@@ -249,17 +283,11 @@ async def view_match(index: int, request: Request):
         body = await request.json()
         fid = body.get('untrustedData', {}).get('fid')
         
-        # Get user's matches from database
-        try:
-            matches = await db.get_top_matches(fid, limit=10)
-        except:
-            # Fallback: recalculate
-            matches = await matchmaker.find_matches(fid, limit=5)
+        # Matches from this user's session (only recomputed if it expired)
+        matches = await matchmaker.get_matches(fid, limit=5)
         
         if not matches or index >= len(matches):
-            return JSONResponse(
-                content=frame_generator.generate_no_matches_frame()
-            )
+            return static_frames.response('no_matches')
         
         frame_data = frame_generator.generate_matches_frame(matches, current_index=index)
         return JSONResponse(content=frame_data)
@@ -279,11 +307,8 @@ async def match_details(index: int, request: Request):
         body = await request.json()
         fid = body.get('untrustedData', {}).get('fid')
         
-        # Get matches
-        try:
-            matches = await db.get_top_matches(fid, limit=10)
-        except:
-            matches = await matchmaker.find_matches(fid, limit=5)
+        # Matches from this user's session (only recomputed if it expired)
+        matches = await matchmaker.get_matches(fid, limit=5)
         
         if not matches or index >= len(matches):
             return JSONResponse(
@@ -311,11 +336,8 @@ async def share_match(request: Request, index: int = 0):
         body = await request.json()
         fid = body.get('untrustedData', {}).get('fid')
         
-        # Get matches
-        try:
-            matches = await db.get_top_matches(fid, limit=10)
-        except:
-            matches = await matchmaker.find_matches(fid, limit=5)
+        # Matches from this user's session (only recomputed if it expired)
+        matches = await matchmaker.get_matches(fid, limit=5)
         
         if not matches or index >= len(matches):
             return JSONResponse(
@@ -325,13 +347,10 @@ async def share_match(request: Request, index: int = 0):
         match_data = matches[index]
         
         # Log share event
-        try:
-            await db.log_analytics('match_shared', fid, {
-                'match_fid': match_data['match_fid'],
-                'compatibility_score': match_data['compatibility_score']
-            })
-        except:
-            pass
+        analytics.log('match_shared', fid, {
+            'match_fid': match_data['match_fid'],
+            'compatibility_score': match_data['compatibility_score']
+        })
         
         frame_data = frame_generator.generate_share_frame(match_data)
         return JSONResponse(content=frame_data)
@@ -347,8 +366,7 @@ async def share_match(request: Request, index: int = 0):
 @app.post("/api/info")
 async def info():
     """Information about how it works"""
-    frame_data = frame_generator.generate_info_frame()
-    return JSONResponse(content=frame_data)
+    return static_frames.response('info')
 
 
 # ============================================================================
@@ -365,6 +383,29 @@ async def health_check():
     }
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """Internal performance metrics"""
+    return {
+        "farcaster_pool": matchmaker.farcaster_client.get_pool_stats(),
+        "graph_crawler": matchmaker.farcaster_client.crawler.get_stats(),
+        "cache": matchmaker.cache.get_stats(),
+        "candidate_pool": matchmaker.candidate_pool.get_stats(),
+        "rate_limiter": rate_limiter.get_stats(),
+        "analytics": analytics.get_stats(),
+        "analytics_rollup": analytics_rollup.get_stats(),
+        "image_renderer": image_renderer.get_stats(),
+        "static_frames": static_frames.get_stats(),
+        "static_images": static_images.get_stats(),
+        "match_sessions": matchmaker.match_sessions.get_stats(),
+        "comedy": matchmaker.comedy_generator.get_stats(),
+        "single_flight": {
+            "matchmaker": matchmaker.flights.get_stats(),
+            "farcaster": matchmaker.farcaster_client.flights.get_stats()
+        }
+    }
+
+
 @app.get("/api/personalities")
 async def list_personalities():
     """List all available personality types"""
@@ -396,7 +437,7 @@ async def check_compatibility(fid1: int, fid2: int):
 async def get_analytics():
     """Get platform analytics (requires authentication in production)"""
     try:
-        stats = await db.get_analytics_summary(days=7)
+        stats = await analytics_rollup.get_summary(days=7)
         return stats
     except Exception as e:
         return {
@@ -406,48 +447,46 @@ async def get_analytics():
 
 
 # ============================================================================
-# IMAGE GENERATION ENDPOINTS (Placeholder)
+# IMAGE GENERATION ENDPOINTS
 # ============================================================================
 
+async def render_image(request: Request, kind: str, data: str) -> Response:
+    """Render (or serve from cache) a card for an image URL's state token"""
+    inputs = frame_generator.decode_image_state(kind, data)
+    if inputs is None:
+        return Response(status_code=400, content="Invalid image state")
+    
+    # Cards are content addressed, so a matching ETag needs no render at all
+    etag = image_renderer.etag(kind, inputs)
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL})
+    
+    png, etag = await image_renderer.render(kind, inputs)
+    return cached_response(request, png, 'image/png', etag)
+
+
 @app.get("/api/generate-image/personality")
-async def generate_personality_image(data: str):
+async def generate_personality_image(request: Request, data: str):
     """Generate personality result image"""
-    # TODO: Implement image generation using PIL or similar
-    # For now, return placeholder
-    return Response(
-        content=open('static/images/placeholder.png', 'rb').read() if os.path.exists('static/images/placeholder.png') else b'',
-        media_type='image/png'
-    )
+    return await render_image(request, 'personality', data)
 
 
 @app.get("/api/generate-image/match")
-async def generate_match_image(data: str):
+async def generate_match_image(request: Request, data: str):
     """Generate match result image"""
-    # TODO: Implement image generation
-    return Response(
-        content=open('static/images/placeholder.png', 'rb').read() if os.path.exists('static/images/placeholder.png') else b'',
-        media_type='image/png'
-    )
+    return await render_image(request, 'match', data)
 
 
 @app.get("/api/generate-image/details")
-async def generate_details_image(data: str):
+async def generate_details_image(request: Request, data: str):
     """Generate detailed analysis image"""
-    # TODO: Implement image generation
-    return Response(
-        content=open('static/images/placeholder.png', 'rb').read() if os.path.exists('static/images/placeholder.png') else b'',
-        media_type='image/png'
-    )
+    return await render_image(request, 'details', data)
 
 
 @app.get("/api/generate-image/share")
-async def generate_share_image(data: str):
+async def generate_share_image(request: Request, data: str):
     """Generate shareable image"""
-    # TODO: Implement image generation
-    return Response(
-        content=open('static/images/placeholder.png', 'rb').read() if os.path.exists('static/images/placeholder.png') else b'',
-        media_type='image/png'
-    )
+    return await render_image(request, 'share', data)
 
 
 # ============================================================================
@@ -455,86 +494,11 @@ async def generate_share_image(data: str):
 # ============================================================================
 
 @app.get("/.well-known/farcaster.json")
-async def farcaster_manifest():
-    """Farcaster Mini App Manifest - Direct JSON Response"""
-    # Get the deployment URL
-    vercel_url = os.getenv('VERCEL_URL')
-    if vercel_url:
-        app_url = f'https://{vercel_url}' if not vercel_url.startswith('http') else vercel_url
-    else:
-        app_url = BASE_URL
-    
-    manifest = {
-        "accountAssociation": {
-            "header": "eyJmaWQiOjAsInR5cGUiOiJjdXN0b2R5Iiwia2V5IjoiMHgwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwIn0",
-            "payload": "eyJkb21haW4iOiJjcnlwdG8tY29tcGF0aWJpbGl0eS5jb20ifQ",
-            "signature": "MHg..."
-        },
-        "frame": {
-            "version": "1",
-            "name": "Crypto Compatibility",
-            "iconUrl": f"{app_url}/static/images/icon-512.png",
-            "splashImageUrl": f"{app_url}/static/images/splash.png",
-            "splashBackgroundColor": "#667eea",
-            "homeUrl": app_url,
-            "imageUrl": f"{app_url}/static/images/og-image.png",
-            "buttonTitle": "Find Your Match",
-            "webhookUrl": f"{app_url}/api/webhook"
-        }
-    }
-    
-    print(f"🎯 Serving Farcaster manifest for: {app_url}")
-    
-    return JSONResponse(
-        content=manifest,
-        headers={
-            "Content-Type": "application/json",
-            "Cache-Control": "public, max-age=3600",
-            "Access-Control-Allow-Origin": "*"
-        }
-    )
-
-
 @app.get("/api/farcaster-manifest")
 @app.get("/farcaster.json")
-async def farcaster_manifest_alternative():
-    """Alternative manifest endpoint - same as .well-known"""
-    # Use same logic as main manifest
-    vercel_url = os.getenv('VERCEL_URL')
-    if vercel_url:
-        app_url = f'https://{vercel_url}' if not vercel_url.startswith('http') else vercel_url
-    else:
-        app_url = BASE_URL
-    
-    manifest = {
-        "accountAssociation": {
-            "header": "eyJmaWQiOjAsInR5cGUiOiJjdXN0b2R5Iiwia2V5IjoiMHgwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwIn0",
-            "payload": "eyJkb21haW4iOiJjcnlwdG8tY29tcGF0aWJpbGl0eS5jb20ifQ",
-            "signature": "MHg..."
-        },
-        "frame": {
-            "version": "1",
-            "name": "Crypto Compatibility",
-            "iconUrl": f"{app_url}/static/images/icon-512.png",
-            "splashImageUrl": f"{app_url}/static/images/splash.png",
-            "splashBackgroundColor": "#667eea",
-            "homeUrl": app_url,
-            "imageUrl": f"{app_url}/static/images/og-image.png",
-            "buttonTitle": "Find Your Match",
-            "webhookUrl": f"{app_url}/api/webhook"
-        }
-    }
-    
-    print(f"🔗 Alternative manifest endpoint serving for: {app_url}")
-    
-    return JSONResponse(
-        content=manifest,
-        headers={
-            "Content-Type": "application/json",
-            "Cache-Control": "public, max-age=3600",
-            "Access-Control-Allow-Origin": "*"
-        }
-    )
+async def farcaster_manifest(request: Request):
+    """Farcaster Mini App Manifest - Direct JSON Response"""
+    return static_frames.response('manifest', request)
 
 
 @app.post("/api/webhook")
@@ -542,13 +506,10 @@ async def mini_app_webhook(request: Request):
     """Webhook endpoint for Mini App events"""
     try:
         body = await request.json()
-        print(f"📱 Mini App webhook received: {body}")
+        print(f"📱 Mini App webhook received: {body.get('event', 'unknown') if isinstance(body, dict) else 'unknown'}")
         
-        # Log to analytics if available
-        try:
-            await db.log_analytics('mini_app_event', 0, body)
-        except:
-            pass
+        # Log to analytics (buffered, flushed in the background)
+        analytics.log('mini_app_event', 0, body)
         
         return {"status": "ok", "message": "Webhook received"}
     except Exception as e:
@@ -558,16 +519,9 @@ async def mini_app_webhook(request: Request):
 
 # Placeholder images endpoints
 @app.get("/images/{image_name}")
-async def serve_image(image_name: str):
+async def serve_image(request: Request, image_name: str):
     """Serve static images"""
-    image_path = f"static/images/{image_name}"
-    if os.path.exists(image_path):
-        return Response(
-            content=open(image_path, 'rb').read(),
-            media_type='image/png'
-        )
-    # Return placeholder if image doesn't exist
-    return Response(content=b'', media_type='image/png')
+    return await static_images.response(request, image_name)
 
 
 if __name__ == "__main__":
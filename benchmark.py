@@ -0,0 +1,174 @@
+"""
+Benchmark script for Crypto Compatibility Engine
+Run this to measure hot paths (database sections need DATABASE_URL)
+"""
+import asyncio
+import time
+
+print("⏱️  Benchmarking Crypto Compatibility Engine...")
+print("=" * 50)
+
+
+def report(label: str, seconds: float, runs: int = 1):
+    """Print the average time per run in milliseconds"""
+    print(f"   {label:<40} {seconds / runs * 1000:>10.2f} ms")
+
+
+# Benchmark 1: Match persistence (per-row loop vs bulk)
+print("\n1️⃣  Benchmarking match persistence...")
+
+# FIDs reserved for benchmark rows so real data is never touched
+BENCH_USER_FID = 9_000_000_000
+BENCH_MATCH_FID_START = 9_000_000_001
+
+
+def fake_matches(count: int):
+    return [{
+        'match_fid': BENCH_MATCH_FID_START + i,
+        'match_username': f'bench_{i}',
+        'compatibility_score': 100 - (i % 100),
+        'breakdown': {'personality_match': 80, 'trait_match': 70},
+        'match_analysis': {'personality_type': 'bitcoin_purist', 'scores': {'risk_tolerance': 50}}
+    } for i in range(count)]
+
+
+async def bench_match_persistence():
+    try:
+        from database import db
+        await db.connect()
+    except Exception as e:
+        print(f"⚠️  Skipped (database not available)")
+        print(f"   Reason: {e}")
+        return
+    
+    sizes = [5, 100, 1000]
+    try:
+        # Matches reference users, so seed the benchmark users first
+        async with db.pool.acquire() as conn:
+            await conn.executemany("""
+                INSERT INTO users (fid, username) VALUES ($1, $2)
+                ON CONFLICT (fid) DO NOTHING
+            """, [(BENCH_USER_FID, 'bench_user')] +
+                 [(BENCH_MATCH_FID_START + i, f'bench_{i}') for i in range(max(sizes))])
+        
+        for size in sizes:
+            matches = fake_matches(size)
+            
+            started = time.perf_counter()
+            for match in matches:
+                await db.save_match(
+                    user_fid=BENCH_USER_FID,
+                    match_fid=match['match_fid'],
+                    compatibility_score=match['compatibility_score'],
+                    match_details=match
+                )
+            await db.log_analytics('matches_found', BENCH_USER_FID, {'match_count': size})
+            report(f"per-row loop ({size} matches)", time.perf_counter() - started)
+            
+            started = time.perf_counter()
+            await db.save_matches_bulk(
+                BENCH_USER_FID,
+                matches,
+                analytics_event='matches_found',
+                analytics_data={'match_count': size}
+            )
+            report(f"save_matches_bulk ({size} matches)", time.perf_counter() - started)
+    finally:
+        async with db.pool.acquire() as conn:
+            await conn.execute("DELETE FROM matches WHERE user_fid = $1", BENCH_USER_FID)
+            await conn.execute("DELETE FROM analytics WHERE fid = $1", BENCH_USER_FID)
+            await conn.execute("DELETE FROM users WHERE fid >= $1", BENCH_USER_FID)
+        await db.disconnect()
+
+asyncio.run(bench_match_persistence())
+
+# Benchmark 2: Frame image state (legacy base64 JSON vs state tokens)
+print("\n2️⃣  Benchmarking frame image state encoding...")
+
+
+async def bench_state_tokens():
+    from matching_algorithm.matchmaker import MatchmakerAI
+    from frame_generator.frame_builder import FrameGenerator
+    from frame_generator.image_renderer import render_inputs
+    
+    matchmaker = MatchmakerAI(use_mock_data=True)
+    frame_gen = FrameGenerator("http://localhost:8000", secret_key='benchmark')
+    analysis = await matchmaker.analyze_user_personality(3)
+    matches = await matchmaker.find_matches(3, limit=1)
+    if not matches:
+        print("⚠️  Skipped (no mock matches)")
+        return
+    
+    runs = 2000
+    for kind, data in [('personality', analysis), ('match', matches[0]), ('details', matches[0])]:
+        legacy = frame_gen._encode_data(data)
+        token = frame_gen.state_tokens.encode(kind, data)
+        print(f"   {kind}: legacy {len(legacy)} chars, token {len(token)} chars "
+              f"({len(token) / len(legacy):.1%})")
+        
+        started = time.perf_counter()
+        for _ in range(runs):
+            frame_gen._encode_data(data)
+        report(f"legacy encode ({kind})", time.perf_counter() - started, runs)
+        
+        started = time.perf_counter()
+        for _ in range(runs):
+            frame_gen.state_tokens.encode(kind, data)
+        report(f"token encode ({kind})", time.perf_counter() - started, runs)
+        
+        started = time.perf_counter()
+        for _ in range(runs):
+            render_inputs(kind, frame_gen._decode_data(legacy))
+        report(f"legacy decode ({kind})", time.perf_counter() - started, runs)
+        
+        started = time.perf_counter()
+        for _ in range(runs):
+            frame_gen.decode_image_state(kind, token)
+        report(f"token decode ({kind})", time.perf_counter() - started, runs)
+
+asyncio.run(bench_state_tokens())
+
+# Benchmark 3: Comedy content rendering (compiled templates, seeded batches)
+print("\n3️⃣  Benchmarking comedy content rendering...")
+
+
+def bench_comedy_rendering():
+    import random
+    from comedy_generator import ComedyGenerator
+    from personality import PersonalityAnalyzer
+    
+    comedy = ComedyGenerator()
+    analyzer = PersonalityAnalyzer()
+    user = {**analyzer.build_analysis('bitcoin_purist', {}), 'username': 'bench_user'}
+    pairs = [({**analyzer.build_analysis(pid, {}), 'username': f'bench_{i}'}, i % 101)
+             for i, pid in enumerate(analyzer.personality_ids * 100)]
+    runs = 5
+    
+    started = time.perf_counter()
+    for _ in range(runs):
+        comedy.render_batch(user, pairs, seed=1)
+    elapsed = time.perf_counter() - started
+    report(f"render_batch ({len(pairs)} pairs)", elapsed, runs)
+    print(f"   {len(pairs) * runs / elapsed:,.0f} contents/sec, "
+          f"reproducible: {comedy.render_batch(user, pairs, seed=1) == comedy.render_batch(user, pairs, seed=1)}")
+    
+    values = {'username': 'bench', 'compatibility': 87, 'funny_comment': 'lol', 'match_comment': 'lol',
+              'trait_comment': 'both degens', 'date_idea': 'ape together', 'personality_comment': 'Degen'}
+    rng = random.Random(1)
+    runs = 100_000
+    started = time.perf_counter()
+    for _ in range(runs):
+        rng.choice(comedy.comedy_templates['viral_share_templates']).format(**values)
+    report("1000 share texts via str.format", time.perf_counter() - started, runs // 1000)
+    
+    started = time.perf_counter()
+    for _ in range(runs):
+        rng.choice(comedy.engine.share_templates).render(values)
+    report("1000 share texts via pre-parsed template", time.perf_counter() - started, runs // 1000)
+
+bench_comedy_rendering()
+
+# Summary
+print("\n" + "=" * 50)
+print("🏁 Benchmarks finished!")
+print("=" * 50)
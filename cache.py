@@ -0,0 +1,184 @@
+"""
+Tiered cache - bounded in-process LRU in front of a shared Redis tier
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from redis_store import RedisStore
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded in-process LRU cache with a TTL per entry"""
+    
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: str) -> Any:
+        """Return the cached value, or _MISSING if absent or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TieredCache:
+    """
+    Two-tier cache: in-process LRU first, then Redis (when connected).
+    
+    Keys look like "<kind>:<id>" (e.g. "profile:123"); hit/miss counters are
+    kept per kind. A cached value of None is a negative entry - callers get a
+    hit with value None and should treat the key as known-missing.
+    Values must be JSON serializable to be shared through Redis.
+    """
+    
+    def __init__(self, redis_store: RedisStore, namespace: str = 'cce',
+                 max_entries: int = 10000):
+        self.redis_store = redis_store
+        self.namespace = namespace
+        self.local = LRUCache(max_entries)
+        self._stats: Dict[str, Dict[str, int]] = {}
+    
+    def _count(self, key: str, counter: str, amount: int = 1) -> None:
+        kind = key.split(':', 1)[0]
+        stats = self._stats.setdefault(kind, {
+            'local_hits': 0,
+            'redis_hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'redis_errors': 0
+        })
+        stats[counter] += amount
+    
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+    
+    async def get(self, key: str) -> Tuple[bool, Optional[Any]]:
+        """Return (hit, value) for a single key"""
+        found = await self.get_many([key])
+        if key in found:
+            return True, found[key]
+        return False, None
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Return a dict of every key that hit (negative entries map to None)"""
+        found = {}
+        remote_keys = []
+        
+        for key in keys:
+            value = self.local.get(key)
+            if value is _MISSING:
+                remote_keys.append(key)
+                continue
+            self._count(key, 'local_hits')
+            if value is None:
+                self._count(key, 'negative_hits')
+            found[key] = value
+        
+        client = self.redis_store.client
+        if remote_keys and client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key in remote_keys:
+                    pipe.get(self._redis_key(key))
+                    pipe.pttl(self._redis_key(key))
+                results = await pipe.execute()
+            except Exception as e:
+                print(f"Redis cache read failed: {e}")
+                for key in remote_keys:
+                    self._count(key, 'redis_errors')
+                results = [None, None] * len(remote_keys)
+            
+            for i, key in enumerate(remote_keys):
+                raw, ttl_ms = results[2 * i], results[2 * i + 1]
+                if raw is None:
+                    continue
+                value = json.loads(raw)
+                self._count(key, 'redis_hits')
+                if value is None:
+                    self._count(key, 'negative_hits')
+                # Promote to the local tier for the rest of the Redis TTL
+                if ttl_ms and ttl_ms > 0:
+                    self.local.set(key, value, ttl_ms / 1000)
+                found[key] = value
+        
+        for key in keys:
+            if key not in found:
+                self._count(key, 'misses')
+        
+        return found
+    
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.set_many({key: value}, ttl)
+    
+    async def set_many(self, items: Dict[str, Any], ttl: float) -> None:
+        """Store every item in both tiers with the same TTL"""
+        if not items:
+            return
+        
+        for key, value in items.items():
+            self.local.set(key, value, ttl)
+            self._count(key, 'sets')
+        
+        client = self.redis_store.client
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, value in items.items():
+                    pipe.set(self._redis_key(key), json.dumps(value), px=int(ttl * 1000))
+                await pipe.execute()
+            except Exception as e:
+                print(f"Redis cache write failed: {e}")
+                for key in items:
+                    self._count(key, 'redis_errors')
+    
+    async def delete(self, key: str) -> None:
+        self.local.delete(key)
+        client = self.redis_store.client
+        if client is not None:
+            try:
+                await client.delete(self._redis_key(key))
+            except Exception as e:
+                print(f"Redis cache delete failed: {e}")
+                self._count(key, 'redis_errors')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per key kind"""
+        kinds = {}
+        for kind, stats in self._stats.items():
+            lookups = stats['local_hits'] + stats['redis_hits'] + stats['misses']
+            hits = stats['local_hits'] + stats['redis_hits']
+            kinds[kind] = {
+                **stats,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0
+            }
+        
+        return {
+            'local_entries': len(self.local),
+            'local_max_entries': self.local.max_entries,
+            'redis_connected': self.redis_store.available,
+            'kinds': kinds
+        }
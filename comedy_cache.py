@@ -0,0 +1,211 @@
+"""
+Comedy Cache - Rotating pools of AI match comments per (personality pair, score band)
+
+The comment prompt only depends on the two archetypes and the score, so
+generations are pooled per key and served round-robin. A pool that is not
+full yet, or that has been served pool_size times since its last refill,
+gets one fresh generation in the background (replacing its oldest entry once
+full). Pools are persisted to a JSON file so restarts start warm.
+"""
+import asyncio
+import json
+import os
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Set
+
+# Lower bounds of the score bands (same bands as the result headers)
+SCORE_BANDS = (0, 25, 40, 60, 75, 90)
+CACHE_VERSION = 1
+
+
+def score_band(score: int) -> int:
+    """Index of the band a compatibility score falls in"""
+    return max(0, bisect_right(SCORE_BANDS, score) - 1)
+
+
+def band_score(band: int) -> int:
+    """Representative (middle) score of a band"""
+    upper = SCORE_BANDS[band + 1] if band + 1 < len(SCORE_BANDS) else 101
+    return (SCORE_BANDS[band] + upper - 1) // 2
+
+
+def pair_key(personality1: str, personality2: str, score: int) -> str:
+    """Cache key: the pair is order-independent"""
+    first, second = sorted((personality1, personality2))
+    return f"{first}|{second}|{score_band(score)}"
+
+
+@dataclass
+class ComedyPool:
+    entries: List[str] = field(default_factory=list)
+    cursor: int = 0
+    # Servings since the last refill
+    served: int = 0
+    # Slot the next generation replaces once the pool is full
+    oldest: int = 0
+
+
+class ComedyCache:
+    def __init__(self, path: Optional[str] = 'data/comedy_cache.json', pool_size: Optional[int] = None,
+                 save_interval: Optional[float] = None):
+        self.path = path
+        self.pool_size = pool_size or int(os.getenv('COMEDY_CACHE_POOL_SIZE', 5))
+        self.save_interval = save_interval if save_interval is not None else float(
+            os.getenv('COMEDY_CACHE_SAVE_INTERVAL', 30)
+        )
+        
+        self._pools: Dict[str, ComedyPool] = {}
+        self._refilling: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._save_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'refills': 0,
+            'refill_errors': 0,
+            'saves': 0
+        }
+        self._load()
+    
+    def take(self, key: str) -> Optional[str]:
+        """Next pooled comment for a key (round-robin), or None on a miss"""
+        pool = self._pools.get(key)
+        if pool is None or not pool.entries:
+            self._stats['misses'] += 1
+            return None
+        
+        entry = pool.entries[pool.cursor % len(pool.entries)]
+        pool.cursor = (pool.cursor + 1) % len(pool.entries)
+        pool.served += 1
+        self._stats['hits'] += 1
+        return entry
+    
+    def needs_refill(self, key: str) -> bool:
+        pool = self._pools.get(key)
+        if pool is None or key in self._refilling:
+            return False
+        return len(pool.entries) < self.pool_size or pool.served >= self.pool_size
+    
+    def add(self, key: str, entry: str) -> None:
+        """Add a generation, replacing the pool's oldest entry once it is full"""
+        pool = self._pools.setdefault(key, ComedyPool())
+        if len(pool.entries) < self.pool_size:
+            pool.entries.append(entry)
+        else:
+            pool.entries[pool.oldest] = entry
+            pool.oldest = (pool.oldest + 1) % len(pool.entries)
+        pool.served = 0
+        self._dirty = True
+        self._schedule_save()
+    
+    def refill(self, key: str, generate: Callable[[], Awaitable[Optional[str]]]) -> None:
+        """Add one generation for key in the background (no-op if one is running)"""
+        if key in self._refilling:
+            return
+        self._refilling.add(key)
+        task = asyncio.ensure_future(self._refill(key, generate))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _refill(self, key: str, generate: Callable[[], Awaitable[Optional[str]]]) -> None:
+        try:
+            entry = await generate()
+            if entry:
+                self.add(key, entry)
+                self._stats['refills'] += 1
+            else:
+                self._stats['refill_errors'] += 1
+        except Exception as e:
+            print(f"Comedy cache refill failed for {key}: {e}")
+            self._stats['refill_errors'] += 1
+        finally:
+            self._refilling.discard(key)
+    
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != CACHE_VERSION:
+                return
+            for key, entries in data['pools'].items():
+                self._pools[key] = ComedyPool(entries=list(entries)[:self.pool_size])
+        except Exception as e:
+            print(f"Comedy cache load failed: {e}")
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            'version': CACHE_VERSION,
+            'pools': {key: list(pool.entries) for key, pool in self._pools.items() if pool.entries}
+        }
+    
+    def _write(self, snapshot: Dict[str, Any]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+    
+    def _schedule_save(self) -> None:
+        """Write the pools after save_interval, batching the additions made meanwhile"""
+        if not self.path or (self._save_task is not None and not self._save_task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No running loop (synchronous use): write now
+            self.save()
+            return
+        self._save_task = loop.create_task(self._delayed_save())
+    
+    async def _delayed_save(self) -> None:
+        await asyncio.sleep(self.save_interval)
+        await self.flush()
+    
+    async def flush(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, self._snapshot())
+            self._stats['saves'] += 1
+        except Exception as e:
+            print(f"Comedy cache save failed: {e}")
+            self._dirty = True
+    
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        try:
+            self._write(self._snapshot())
+            self._stats['saves'] += 1
+        except Exception as e:
+            print(f"Comedy cache save failed: {e}")
+            self._dirty = True
+    
+    async def close(self) -> None:
+        """Cancel pending refills and persist the pools"""
+        tasks = list(self._tasks)
+        if self._save_task is not None and not self._save_task.done():
+            tasks.append(self._save_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            **self._stats,
+            'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+            'keys': len(self._pools),
+            'entries': sum(len(pool.entries) for pool in self._pools.values()),
+            'refilling': len(self._refilling),
+            'pool_size': self.pool_size
+        }
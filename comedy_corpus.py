@@ -0,0 +1,132 @@
+"""
+Comedy Corpus - Pre-generated comedy lines in a versioned, memory-mapped file
+
+Written by generate_corpus.py, read by ComedyGenerator at startup. Only the
+key index is parsed on open; lines stay in the mapping and are decoded when
+picked. Layout (little-endian):
+
+    header   magic "CCRP", version u16, reserved u16, key count u32,
+             line count u32, created at f64
+    keys     per key: key offset u32, key length u16, kind u8, pad,
+             first line u32, line count u32 (sorted by kind, key)
+    lines    per line: offset u32, length u32
+    blob     UTF-8 keys and lines (offsets are from the start of the file)
+
+Keys are comedy_cache.pair_key() for comments and share lines, and the bare
+"<id>|<id>" pair for date ideas.
+"""
+import mmap
+import os
+import random
+import struct
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+MAGIC = b'CCRP'
+CORPUS_VERSION = 1
+
+HEADER = struct.Struct('<4sHHIId')
+KEY_RECORD = struct.Struct('<IHBxII')
+LINE_RECORD = struct.Struct('<II')
+
+KINDS = {'comment': 1, 'share': 2, 'date_idea': 3}
+
+
+def pair_only_key(personality1: str, personality2: str) -> str:
+    """Order-independent key without a score band (date ideas)"""
+    first, second = sorted((personality1, personality2))
+    return f"{first}|{second}"
+
+
+def write_corpus(path: str, entries: Dict[Tuple[str, str], List[str]]) -> int:
+    """Write {(kind, key): lines} atomically; returns the file size"""
+    items = sorted(((KINDS[kind], key.encode('utf-8'), lines)
+                    for (kind, key), lines in entries.items() if lines))
+    line_count = sum(len(lines) for _, _, lines in items)
+    
+    blob_offset = HEADER.size + KEY_RECORD.size * len(items) + LINE_RECORD.size * line_count
+    blob = bytearray()
+    key_records = []
+    line_records = []
+    for kind, key, lines in items:
+        key_records.append(KEY_RECORD.pack(blob_offset + len(blob), len(key), kind,
+                                           len(line_records), len(lines)))
+        blob += key
+        for line in lines:
+            encoded = line.encode('utf-8')
+            line_records.append(LINE_RECORD.pack(blob_offset + len(blob), len(encoded)))
+            blob += encoded
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, CORPUS_VERSION, 0, len(items), line_count, time.time()))
+        f.write(b''.join(key_records))
+        f.write(b''.join(line_records))
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return blob_offset + len(blob)
+
+
+class ComedyCorpus:
+    def __init__(self, path: str):
+        """Map a corpus file (raises ValueError if it isn't a supported corpus)"""
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        try:
+            magic, version, _, key_count, line_count, created_at = HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            self._map.close()
+            raise ValueError(f"{path} is too short to be a comedy corpus")
+        if magic != MAGIC or version != CORPUS_VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {CORPUS_VERSION} comedy corpus")
+        
+        self.version = version
+        self.created_at = created_at
+        self.line_count = line_count
+        self._lines_offset = HEADER.size + KEY_RECORD.size * key_count
+        
+        # (kind, key) -> (first line, line count)
+        self._index: Dict[Tuple[int, str], Tuple[int, int]] = {}
+        for position in range(key_count):
+            key_offset, key_length, kind, first, count = KEY_RECORD.unpack_from(
+                self._map, HEADER.size + position * KEY_RECORD.size
+            )
+            key = self._map[key_offset:key_offset + key_length].decode('utf-8')
+            self._index[(kind, key)] = (first, count)
+    
+    def count(self, kind: str, key: str) -> int:
+        return self._index.get((KINDS[kind], key), (0, 0))[1]
+    
+    def line(self, number: int) -> str:
+        offset, length = LINE_RECORD.unpack_from(self._map, self._lines_offset + number * LINE_RECORD.size)
+        return self._map[offset:offset + length].decode('utf-8')
+    
+    def lines(self, kind: str, key: str) -> List[str]:
+        first, count = self._index.get((KINDS[kind], key), (0, 0))
+        return [self.line(first + i) for i in range(count)]
+    
+    def pick(self, kind: str, key: str, rng: Optional[random.Random] = None) -> Optional[str]:
+        """A random line for (kind, key), or None if the corpus has none"""
+        first, count = self._index.get((KINDS[kind], key), (0, 0))
+        if not count:
+            return None
+        return self.line(first + (rng or random).randrange(count))
+    
+    def close(self) -> None:
+        self._map.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'version': self.version,
+            'created_at': self.created_at,
+            'keys': len(self._index),
+            'lines': self.line_count,
+            'bytes': len(self._map)
+        }
@@ -0,0 +1,161 @@
+"""
+Comedy Engine - comedy.json compiled into indexed lookup structures
+
+Built once when ComedyGenerator loads its templates:
+- per-score tables (0-100) for the match comment pools and result headers
+- date idea pools and trait comment candidates per archetype pair, computed
+  from the archetypes' traits (other trait sets are computed per call)
+- share templates pre-parsed into literal/field segments; a placeholder the
+  generator doesn't supply fails at load time instead of on every share
+"""
+from string import Formatter
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+# Placeholders a share template may use
+SHARE_FIELDS = frozenset({
+    'username', 'compatibility', 'funny_comment', 'match_comment',
+    'trait_comment', 'date_idea', 'personality_comment'
+})
+
+# (lowest score, key) from the highest band down
+MATCH_COMMENT_BANDS = ((80, 'high_compatibility'), (50, 'medium_compatibility'), (0, 'low_compatibility'))
+RESULT_HEADER_BANDS = ((90, '90_100'), (75, '75_89'), (60, '60_74'), (40, '40_59'), (25, '25_39'), (0, '0_24'))
+
+DEFAULT_TRAIT_COMMENT = "You both love crypto - that's a start! 💎"
+
+
+def clamp_score(score: int) -> int:
+    return min(100, max(0, int(score)))
+
+
+def score_table(bands: Sequence[Tuple[int, str]], values: Dict[str, Any]) -> Tuple[Any, ...]:
+    """values[key] of the matching band for every score 0-100"""
+    return tuple(
+        next(values[key] for lowest, key in bands if score >= lowest)
+        for score in range(101)
+    )
+
+
+def date_category(traits1: Dict[str, Any], traits2: Dict[str, Any]) -> str:
+    """Date idea category for a pair's average traits"""
+    avg_defi = (traits1.get('defi_engagement', 0) + traits2.get('defi_engagement', 0)) / 2
+    avg_nft = (traits1.get('nft_interest', 0) + traits2.get('nft_interest', 0)) / 2
+    avg_meme = (traits1.get('meme_coin_tolerance', 0) + traits2.get('meme_coin_tolerance', 0)) / 2
+    avg_risk = (traits1.get('risk_tolerance', 0) + traits2.get('risk_tolerance', 0)) / 2
+    
+    if avg_defi > 70:
+        return 'defi_focused'
+    elif avg_nft > 70:
+        return 'nft_focused'
+    elif avg_meme > 70:
+        return 'meme_focused'
+    elif avg_risk < 40:
+        return 'conservative_focused'
+    return 'trading_focused'
+
+
+def trait_comment_keys(traits1: Dict[str, Any], traits2: Dict[str, Any]) -> List[str]:
+    """trait_comments keys that apply to a pair"""
+    keys = []
+    
+    # Similar risk tolerance
+    risk1 = traits1.get('risk_tolerance', 50)
+    if abs(risk1 - traits2.get('risk_tolerance', 50)) < 20:
+        if risk1 > 75:
+            keys.append('both_high_risk')
+        elif risk1 < 40:
+            keys.append('both_low_risk')
+    else:
+        keys.append('opposite_risk')
+    
+    # NFT interest
+    if traits1.get('nft_interest', 50) > 70 and traits2.get('nft_interest', 50) > 70:
+        keys.append('both_nft_lovers')
+    elif traits1.get('nft_interest', 50) < 30 and traits2.get('nft_interest', 50) < 30:
+        keys.append('both_nft_haters')
+    
+    # DeFi engagement
+    if traits1.get('defi_engagement', 50) > 75 and traits2.get('defi_engagement', 50) > 75:
+        keys.append('both_defi_addicts')
+    
+    # Meme coin tolerance
+    if traits1.get('meme_coin_tolerance', 50) > 80 and traits2.get('meme_coin_tolerance', 50) > 80:
+        keys.append('both_memecoin_fans')
+    
+    return keys
+
+
+class ShareTemplate:
+    """A share template parsed once into (literal, field) segments"""
+    
+    __slots__ = ('source', 'segments')
+    
+    def __init__(self, source: str):
+        self.source = source
+        segments = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if field is not None and (field not in SHARE_FIELDS or spec or conversion):
+                raise ValueError(f"Unsupported placeholder {{{field}}} in share template: {source!r}")
+            segments.append((literal, field))
+        self.segments: Tuple[Tuple[str, Optional[str]], ...] = tuple(segments)
+    
+    def render(self, values: Dict[str, Any]) -> str:
+        return ''.join([
+            literal + str(values[field]) if field is not None else literal
+            for literal, field in self.segments
+        ])
+
+
+class CompiledComedy:
+    def __init__(self, templates: Dict[str, Any], personalities: List[Dict[str, Any]]):
+        match_comments = {key: tuple(comments) for key, comments in templates['match_comments'].items()}
+        self.match_comments_by_score = score_table(MATCH_COMMENT_BANDS, match_comments)
+        self.result_headers_by_score = score_table(RESULT_HEADER_BANDS, templates['result_headers'])
+        
+        self.date_ideas = {category: tuple(ideas) for category, ideas in templates['date_ideas'].items()}
+        self.trait_comments = dict(templates['trait_comments'])
+        self.share_templates = tuple(ShareTemplate(source) for source in templates['viral_share_templates'])
+        self.personality_roasts = tuple(templates['personality_roasts'])
+        self.opening_lines = tuple(templates['opening_lines'])
+        
+        # Archetype pair -> date ideas / trait comments
+        self._archetype_traits = {p['id']: p['traits'] for p in personalities}
+        self._pair_date_ideas: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._pair_trait_comments: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        for id1, traits1 in self._archetype_traits.items():
+            for id2, traits2 in self._archetype_traits.items():
+                self._pair_date_ideas[(id1, id2)] = self._date_ideas_for_traits(traits1, traits2)
+                self._pair_trait_comments[(id1, id2)] = self._trait_comments_for_traits(traits1, traits2)
+    
+    def match_comments(self, score: int) -> Tuple[str, ...]:
+        return self.match_comments_by_score[clamp_score(score)]
+    
+    def result_header(self, score: int) -> str:
+        return self.result_headers_by_score[clamp_score(score)]
+    
+    def _pair(self, personality1: Dict[str, Any], personality2: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Archetype pair key, if both dicts carry their archetype's own traits"""
+        id1, id2 = personality1.get('personality_type'), personality2.get('personality_type')
+        if (id1 in self._archetype_traits and id2 in self._archetype_traits
+                and personality1.get('traits') == self._archetype_traits[id1]
+                and personality2.get('traits') == self._archetype_traits[id2]):
+            return id1, id2
+        return None
+    
+    def _date_ideas_for_traits(self, traits1: Dict[str, Any], traits2: Dict[str, Any]) -> Tuple[str, ...]:
+        return self.date_ideas.get(date_category(traits1, traits2), self.date_ideas['trading_focused'])
+    
+    def _trait_comments_for_traits(self, traits1: Dict[str, Any], traits2: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(self.trait_comments[key] for key in trait_comment_keys(traits1, traits2))
+    
+    def date_ideas_for(self, personality1: Dict[str, Any], personality2: Dict[str, Any]) -> Tuple[str, ...]:
+        pair = self._pair(personality1, personality2)
+        if pair is not None:
+            return self._pair_date_ideas[pair]
+        return self._date_ideas_for_traits(personality1.get('traits', {}), personality2.get('traits', {}))
+    
+    def trait_comments_for(self, personality1: Dict[str, Any], personality2: Dict[str, Any]) -> Tuple[str, ...]:
+        pair = self._pair(personality1, personality2)
+        if pair is not None:
+            return self._pair_trait_comments[pair]
+        return self._trait_comments_for_traits(personality1.get('traits', {}), personality2.get('traits', {}))
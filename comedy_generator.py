@@ -2,13 +2,71 @@
 Comedy Generator - AI-powered comedy generation for match results
 """
 import os
+import re
 import json
+import time
 import random
-from typing import Dict, Any, List
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
 from pathlib import Path
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from comedy_cache import ComedyCache, pair_key, score_band, band_score
+from comedy_corpus import ComedyCorpus, pair_only_key
+from comedy_engine import CompiledComedy, ShareTemplate, DEFAULT_TRAIT_COMMENT
+
+SYSTEM_PROMPT = "You are a hilarious crypto comedy writer who makes funny dating jokes using crypto culture and memes."
+
+# A streamed comment may stop at a sentence end once it is at least this long
+COMMENT_MIN_CHARS = 20
+# Sentence end (plus closing quotes and trailing emoji) followed by the start of another sentence
+SENTENCE_BREAK = re.compile(r'[.!?]+["\')\]]*(?:\s+[^\w\s]+)*(?=\s+\w)')
+SENTENCE_END = re.compile(r'(?s).*[.!?]["\')\]]*(?:\s+[^\w\s]+)*')
+
+
+def truncate_comment(text: str, max_chars: int) -> str:
+    """Cut text to max_chars at a word boundary, marked with an ellipsis"""
+    head = text[:max_chars - 1]
+    if ' ' in head:
+        head = head.rsplit(' ', 1)[0]
+    return head.rstrip(' ,;:-') + '…'
+
+
+def early_cutoff(text: str, max_chars: int) -> Optional[str]:
+    """The comment so far, cut at its first sentence or max_chars, or None if more text is needed"""
+    for match in SENTENCE_BREAK.finditer(text):
+        if match.end() > max_chars:
+            break
+        if match.end() >= COMMENT_MIN_CHARS:
+            return text[:match.end()].strip()
+    if len(text) > max_chars:
+        return truncate_comment(text, max_chars)
+    return None
+
+
+def completed_sentences(text: str, max_chars: int) -> Optional[str]:
+    """Text up to its last finished sentence (None if there is none worth showing)"""
+    match = SENTENCE_END.match(text.strip())
+    if match is None or len(match.group()) < COMMENT_MIN_CHARS:
+        return None
+    comment = match.group()
+    return comment if len(comment) <= max_chars else truncate_comment(comment, max_chars)
+
+
+def summarize_ms(samples: Deque[float]) -> Dict[str, Any]:
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'avg': round(sum(ordered) / len(ordered), 1),
+        'p50': round(ordered[len(ordered) // 2], 1),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        'max': round(ordered[-1], 1)
+    }
+
 load_dotenv()
 
 class ComedyGenerator:
@@ -29,6 +87,33 @@ class ComedyGenerator:
             self.client = None
         
         self.comedy_templates = self._load_comedy_templates()
+        self.engine = CompiledComedy(self.comedy_templates, self._load_personalities())
+        
+        # Latency budget per LLM call (falls back to a template comment) and
+        # how many calls may run at once across all requests
+        self.ai_timeout = float(os.getenv('COMEDY_AI_TIMEOUT', 3.0))
+        self.ai_concurrency = int(os.getenv('COMEDY_AI_CONCURRENCY', 5))
+        # Background pool refills aren't on the request path but still hold a
+        # concurrency slot, so they get a longer yet bounded budget
+        self.ai_refill_timeout = float(os.getenv('COMEDY_AI_REFILL_TIMEOUT', self.ai_timeout * 4))
+        # Stream completions and stop at the first sentence / character limit
+        self.ai_stream = os.getenv('COMEDY_AI_STREAM', 'true').lower() in ('1', 'true', 'yes')
+        self.ai_max_chars = int(os.getenv('COMEDY_AI_MAX_CHARS', 150))
+        self._ai_semaphore: Optional[asyncio.Semaphore] = None
+        self._ai_semaphore_loop = None
+        self.cache = ComedyCache(os.getenv('COMEDY_CACHE_PATH', 'data/comedy_cache.json'))
+        self.corpus = self._load_corpus(os.getenv('COMEDY_CORPUS_PATH', 'data/comedy_corpus.bin'))
+        self._stats = {
+            'corpus_hits': 0,
+            'ai_calls': 0,
+            'ai_timeouts': 0,
+            'ai_errors': 0,
+            'early_cutoffs': 0,
+            'deadline_partials': 0
+        }
+        # Recent time-to-first-token (streaming) and total call latencies, in ms
+        self._ttft_ms: Deque[float] = deque(maxlen=1000)
+        self._latency_ms: Deque[float] = deque(maxlen=1000)
     
     def _load_comedy_templates(self) -> Dict[str, Any]:
         """Load comedy templates from JSON"""
@@ -36,175 +121,298 @@ class ComedyGenerator:
         with open(comedy_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     
-    def get_match_comment(self, compatibility_score: int) -> str:
+    def _load_personalities(self) -> List[Dict[str, Any]]:
+        """Archetype definitions (the engine precomputes per-pair tables from their traits)"""
+        personality_file = Path(__file__).parent / 'personality_profiles' / 'personalities.json'
+        with open(personality_file, 'r', encoding='utf-8') as f:
+            return json.load(f)['personalities']
+    
+    def _load_corpus(self, path: str) -> Optional[ComedyCorpus]:
+        """Map the pre-generated corpus (see generate_corpus.py) if there is one"""
+        if not os.path.exists(path):
+            return None
+        try:
+            corpus = ComedyCorpus(path)
+            print(f"✅ Comedy corpus loaded ({corpus.line_count} lines)")
+            return corpus
+        except Exception as e:
+            print(f"⚠️ Comedy corpus not loaded: {e}")
+            return None
+    
+    def _corpus_line(self, kind: str, key: str, rng: Optional[random.Random] = None) -> Optional[str]:
+        if self.corpus is None:
+            return None
+        line = self.corpus.pick(kind, key, rng)
+        if line is not None:
+            self._stats['corpus_hits'] += 1
+        return line
+    
+    def get_match_comment(self, compatibility_score: int, rng: Optional[random.Random] = None) -> str:
         """Get a funny comment based on compatibility score"""
-        if compatibility_score >= 80:
-            comments = self.comedy_templates['match_comments']['high_compatibility']
-        elif compatibility_score >= 50:
-            comments = self.comedy_templates['match_comments']['medium_compatibility']
-        else:
-            comments = self.comedy_templates['match_comments']['low_compatibility']
-        
-        return random.choice(comments)
+        return (rng or random).choice(self.engine.match_comments(compatibility_score))
     
-    def get_date_idea(self, personality1: Dict[str, Any], personality2: Dict[str, Any]) -> str:
+    def get_date_idea(self, personality1: Dict[str, Any], personality2: Dict[str, Any],
+                      rng: Optional[random.Random] = None) -> str:
         """Get a date idea based on personality types"""
-        # Determine category based on personalities
-        p1_traits = personality1.get('traits', {})
-        p2_traits = personality2.get('traits', {})
-        
-        avg_defi = (p1_traits.get('defi_engagement', 0) + p2_traits.get('defi_engagement', 0)) / 2
-        avg_nft = (p1_traits.get('nft_interest', 0) + p2_traits.get('nft_interest', 0)) / 2
-        avg_meme = (p1_traits.get('meme_coin_tolerance', 0) + p2_traits.get('meme_coin_tolerance', 0)) / 2
-        avg_risk = (p1_traits.get('risk_tolerance', 0) + p2_traits.get('risk_tolerance', 0)) / 2
-        
-        # Choose category
-        if avg_defi > 70:
-            category = 'defi_focused'
-        elif avg_nft > 70:
-            category = 'nft_focused'
-        elif avg_meme > 70:
-            category = 'meme_focused'
-        elif avg_risk < 40:
-            category = 'conservative_focused'
-        else:
-            category = 'trading_focused'
+        idea = self._corpus_line('date_idea', pair_only_key(self._personality_id(personality1),
+                                                            self._personality_id(personality2)), rng)
+        if idea is not None:
+            return idea
         
-        ideas = self.comedy_templates['date_ideas'].get(category, 
-                self.comedy_templates['date_ideas']['trading_focused'])
-        return random.choice(ideas)
+        return (rng or random).choice(self.engine.date_ideas_for(personality1, personality2))
     
     def get_trait_comment(self, personality1: Dict[str, Any], 
-                         personality2: Dict[str, Any]) -> str:
+                         personality2: Dict[str, Any], rng: Optional[random.Random] = None) -> str:
         """Get a comment about shared traits"""
-        p1_traits = personality1.get('traits', {})
-        p2_traits = personality2.get('traits', {})
-        
-        comments = []
-        
-        # Check for similar risk tolerance
-        risk_diff = abs(p1_traits.get('risk_tolerance', 50) - 
-                       p2_traits.get('risk_tolerance', 50))
-        if risk_diff < 20:
-            if p1_traits.get('risk_tolerance', 50) > 75:
-                comments.append(self.comedy_templates['trait_comments']['both_high_risk'])
-            elif p1_traits.get('risk_tolerance', 50) < 40:
-                comments.append(self.comedy_templates['trait_comments']['both_low_risk'])
-        else:
-            comments.append(self.comedy_templates['trait_comments']['opposite_risk'])
-        
-        # Check for NFT interest
-        if p1_traits.get('nft_interest', 50) > 70 and p2_traits.get('nft_interest', 50) > 70:
-            comments.append(self.comedy_templates['trait_comments']['both_nft_lovers'])
-        elif p1_traits.get('nft_interest', 50) < 30 and p2_traits.get('nft_interest', 50) < 30:
-            comments.append(self.comedy_templates['trait_comments']['both_nft_haters'])
-        
-        # Check for DeFi engagement
-        if p1_traits.get('defi_engagement', 50) > 75 and p2_traits.get('defi_engagement', 50) > 75:
-            comments.append(self.comedy_templates['trait_comments']['both_defi_addicts'])
-        
-        # Check for meme coin tolerance
-        if p1_traits.get('meme_coin_tolerance', 50) > 80 and p2_traits.get('meme_coin_tolerance', 50) > 80:
-            comments.append(self.comedy_templates['trait_comments']['both_memecoin_fans'])
-        
-        return random.choice(comments) if comments else "You both love crypto - that's a start! 💎"
+        comments = self.engine.trait_comments_for(personality1, personality2)
+        # No draw for the default, so the random sequence matches the uncompiled rules
+        return (rng or random).choice(comments) if comments else DEFAULT_TRAIT_COMMENT
     
-    def get_personality_roast(self) -> str:
+    def get_personality_roast(self, rng: Optional[random.Random] = None) -> str:
         """Get a random personality roast"""
-        return random.choice(self.comedy_templates['personality_roasts'])
+        return (rng or random).choice(self.engine.personality_roasts)
     
     def get_result_header(self, compatibility_score: int) -> str:
         """Get result header based on score"""
-        if compatibility_score >= 90:
-            return self.comedy_templates['result_headers']['90_100']
-        elif compatibility_score >= 75:
-            return self.comedy_templates['result_headers']['75_89']
-        elif compatibility_score >= 60:
-            return self.comedy_templates['result_headers']['60_74']
-        elif compatibility_score >= 40:
-            return self.comedy_templates['result_headers']['40_59']
-        elif compatibility_score >= 25:
-            return self.comedy_templates['result_headers']['25_39']
-        else:
-            return self.comedy_templates['result_headers']['0_24']
+        return self.engine.result_header(compatibility_score)
     
     async def generate_ai_comedy(self, personality1: Dict[str, Any], 
                                 personality2: Dict[str, Any],
                                 compatibility_score: int) -> str:
-        """Generate custom comedy using GPT-4"""
+        """Generate custom comedy using GPT-4 (corpus first, then pooled per pair and score band)"""
+        key = pair_key(self._personality_id(personality1), self._personality_id(personality2),
+                       compatibility_score)
+        comment = self._corpus_line('comment', key)
+        if comment is not None:
+            return comment
+        
         if not self.use_ai:
             return self.get_match_comment(compatibility_score)
         
+        comment = self.cache.take(key)
+        if comment is not None:
+            if self.cache.needs_refill(key):
+                refill_score = band_score(score_band(compatibility_score))
+                self.cache.refill(key, lambda: self._ai_comment(personality1, personality2, refill_score,
+                                                                 self.ai_refill_timeout))
+            return comment
+        
+        comment = await self._ai_comment(personality1, personality2, compatibility_score, self.ai_timeout)
+        if comment is None:
+            return self.get_match_comment(compatibility_score)
+        self.cache.add(key, comment)
+        return comment
+    
+    @staticmethod
+    def _personality_id(personality: Dict[str, Any]) -> str:
+        return personality.get('personality_type') or personality.get('personality_name', '')
+    
+    async def _ai_comment(self, personality1: Dict[str, Any], personality2: Dict[str, Any],
+                          compatibility_score: int, timeout: float) -> Optional[str]:
+        """One GPT-4 comment, or None on failure or when nothing usable arrived within timeout"""
+        self._stats['ai_calls'] += 1
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": self.build_prompt('comment', personality1, personality2, compatibility_score)}
+        ]
+        started = time.perf_counter()
+        parts: List[str] = []
+        
         try:
-            prompt = f"""You are a witty crypto dating app comedy writer. Generate a funny, short comment (max 150 characters) about this crypto compatibility match:
-
-Person 1: {personality1['personality_name']} - {personality1['description']}
-Person 2: {personality2['personality_name']} - {personality2['description']}
-Compatibility Score: {compatibility_score}%
-
-Make it funny, use crypto slang/memes, and keep it light-hearted. Include relevant emojis."""
-
+            if self.ai_stream:
+                comment = await asyncio.wait_for(self._stream_comment(messages, parts, started), timeout=timeout)
+            else:
+                comment = await asyncio.wait_for(self._complete_comment(messages), timeout=timeout)
+        
+        except asyncio.TimeoutError:
+            self._stats['ai_timeouts'] += 1
+            # Deadline hit mid-stream: keep the sentences that did arrive
+            comment = completed_sentences(''.join(parts), self.ai_max_chars)
+            if comment is None:
+                return None
+            self._stats['deadline_partials'] += 1
+        except Exception as e:
+            print(f"AI comedy generation failed: {e}")
+            self._stats['ai_errors'] += 1
+            return None
+        
+        self._latency_ms.append((time.perf_counter() - started) * 1000)
+        return comment or None
+    
+    async def _complete_comment(self, messages: List[Dict[str, str]]) -> str:
+        async with self._get_ai_semaphore():
             response = await self.client.chat.completions.create(
                 model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a hilarious crypto comedy writer who makes funny dating jokes using crypto culture and memes."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 max_tokens=100,
                 temperature=0.9
             )
-            
-            return response.choices[0].message.content.strip()
+        return response.choices[0].message.content.strip()
+    
+    async def _stream_comment(self, messages: List[Dict[str, str]], parts: List[str], started: float) -> str:
+        """Consume a streamed completion into parts, stopping at the first sentence or max_chars"""
+        async with self._get_ai_semaphore():
+            stream = await self.client.chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                max_tokens=100,
+                temperature=0.9,
+                stream=True
+            )
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    if not parts:
+                        self._ttft_ms.append((time.perf_counter() - started) * 1000)
+                    parts.append(delta)
+                    
+                    comment = early_cutoff(''.join(parts), self.ai_max_chars)
+                    if comment is not None:
+                        self._stats['early_cutoffs'] += 1
+                        return comment
+            finally:
+                # Closing the response early stops the rest of the generation
+                await stream.response.aclose()
         
-        except Exception as e:
-            print(f"AI comedy generation failed: {e}")
-            return self.get_match_comment(compatibility_score)
+        text = ''.join(parts).strip()
+        return text if len(text) <= self.ai_max_chars else truncate_comment(text, self.ai_max_chars)
+    
+    def build_prompt(self, kind: str, personality1: Dict[str, Any], personality2: Dict[str, Any],
+                     compatibility_score: int, count: int = 1) -> str:
+        """Prompt for a 'comment', 'share' line or 'date_idea' (count > 1 asks for one per line)"""
+        match = f"""Person 1: {personality1['personality_name']} - {personality1['description']}
+Person 2: {personality2['personality_name']} - {personality2['description']}
+Compatibility Score: {compatibility_score}%"""
+        
+        if kind == 'comment':
+            prompt = f"""You are a witty crypto dating app comedy writer. Generate a funny, short comment (max 150 characters) about this crypto compatibility match:
+
+{match}
+
+Make it funny, use crypto slang/memes, and keep it light-hearted. Include relevant emojis. Don't quote the exact score."""
+        elif kind == 'share':
+            prompt = f"""You are a witty crypto dating app comedy writer. Write a short, shareable post (max 200 characters) announcing this crypto compatibility match:
+
+{match}
+
+Write {{username}} where the match's username goes and {{compatibility}} where the score goes; use no other braces. Make it funny and include relevant emojis."""
+        elif kind == 'date_idea':
+            prompt = f"""You are a witty crypto dating app comedy writer. Suggest a funny, crypto-themed first date idea (max 100 characters) for this match:
+
+{match}
+
+Keep it light-hearted. Include an emoji."""
+        else:
+            raise ValueError(f"Unknown prompt kind: {kind}")
+        
+        if count > 1:
+            prompt += f"\n\nWrite {count} different options, one per line, with no numbering."
+        return prompt
+    
+    def _get_ai_semaphore(self) -> asyncio.Semaphore:
+        # Created inside the running loop (asyncio primitives bind to a loop on Python 3.9)
+        loop = asyncio.get_running_loop()
+        if self._ai_semaphore is None or self._ai_semaphore_loop is not loop:
+            self._ai_semaphore = asyncio.Semaphore(self.ai_concurrency)
+            self._ai_semaphore_loop = loop
+        return self._ai_semaphore
     
     async def generate_viral_share_text(self, user_data: Dict[str, Any],
                                        match_data: Dict[str, Any],
-                                       compatibility_score: int) -> str:
-        """Generate viral-optimized share text"""
-        template = random.choice(self.comedy_templates['viral_share_templates'])
-        
-        match_comment = await self.generate_ai_comedy(
-            user_data,
-            match_data,
-            compatibility_score
-        )
-        
-        date_idea = self.get_date_idea(user_data, match_data)
-        trait_comment = self.get_trait_comment(user_data, match_data)
-        
-        share_text = template.format(
-            username=match_data.get('username', 'someone'),
-            compatibility=compatibility_score,
-            funny_comment=match_comment,
-            trait_comment=trait_comment,
-            date_idea=date_idea,
-            personality_comment=user_data.get('personality_name', 'crypto person')
-        )
-        
-        return share_text
-    
-    def get_opening_line(self) -> str:
+                                       compatibility_score: int,
+                                       match_comment: Optional[str] = None,
+                                       date_idea: Optional[str] = None,
+                                       trait_comment: Optional[str] = None) -> str:
+        """Generate viral-optimized share text (reusing any pieces already generated)"""
+        share_line = self._corpus_share_line(user_data, match_data, compatibility_score)
+        if share_line is not None:
+            return share_line
+        
+        template = random.choice(self.engine.share_templates)
+        if match_comment is None:
+            match_comment = await self.generate_ai_comedy(
+                user_data,
+                match_data,
+                compatibility_score
+            )
+        
+        return self._render_share(template, user_data, match_data, compatibility_score,
+                                  match_comment, date_idea, trait_comment)
+    
+    def _share_text(self, user_data: Dict[str, Any], match_data: Dict[str, Any], compatibility_score: int,
+                    match_comment: str, date_idea: Optional[str] = None, trait_comment: Optional[str] = None,
+                    rng: Optional[random.Random] = None) -> str:
+        share_line = self._corpus_share_line(user_data, match_data, compatibility_score, rng)
+        if share_line is not None:
+            return share_line
+        
+        template = (rng or random).choice(self.engine.share_templates)
+        return self._render_share(template, user_data, match_data, compatibility_score,
+                                  match_comment, date_idea, trait_comment, rng)
+    
+    def _corpus_share_line(self, user_data: Dict[str, Any], match_data: Dict[str, Any], compatibility_score: int,
+                           rng: Optional[random.Random] = None) -> Optional[str]:
+        """A pre-generated share line filled in for this match, if the corpus has a usable one"""
+        share_line = self._corpus_line('share', pair_key(self._personality_id(user_data),
+                                                         self._personality_id(match_data),
+                                                         compatibility_score), rng)
+        if share_line is not None:
+            try:
+                return share_line.format(username=match_data.get('username', 'someone'),
+                                         compatibility=compatibility_score)
+            except (KeyError, IndexError, ValueError):
+                pass
+        return None
+    
+    def _render_share(self, template: ShareTemplate, user_data: Dict[str, Any], match_data: Dict[str, Any],
+                      compatibility_score: int, match_comment: str, date_idea: Optional[str],
+                      trait_comment: Optional[str], rng: Optional[random.Random] = None) -> str:
+        if date_idea is None:
+            date_idea = self.get_date_idea(user_data, match_data, rng)
+        if trait_comment is None:
+            trait_comment = self.get_trait_comment(user_data, match_data, rng)
+        
+        return template.render({
+            'username': match_data.get('username', 'someone'),
+            'compatibility': compatibility_score,
+            'funny_comment': match_comment,
+            'match_comment': match_comment,
+            'trait_comment': trait_comment,
+            'date_idea': date_idea,
+            'personality_comment': user_data.get('personality_name', 'crypto person')
+        })
+    
+    def get_opening_line(self, rng: Optional[random.Random] = None) -> str:
         """Get a random opening line"""
-        return random.choice(self.comedy_templates['opening_lines'])
+        return (rng or random).choice(self.engine.opening_lines)
     
     async def generate_full_match_content(self, user1: Dict[str, Any],
                                          user2: Dict[str, Any],
                                          compatibility_score: int) -> Dict[str, Any]:
         """Generate complete match content with all comedy elements"""
+        # One LLM call, reused by the share text
+        match_comment = await self.generate_ai_comedy(user1, user2, compatibility_score)
+        return self._build_content(user1, user2, compatibility_score, match_comment)
+    
+    def _build_content(self, user1: Dict[str, Any], user2: Dict[str, Any], compatibility_score: int,
+                       match_comment: str, rng: Optional[random.Random] = None) -> Dict[str, Any]:
+        rng = rng or random
         
         # Get all comedy elements
         header = self.get_result_header(compatibility_score)
-        match_comment = await self.generate_ai_comedy(user1, user2, compatibility_score)
-        date_idea = self.get_date_idea(user1, user2)
-        trait_comment = self.get_trait_comment(user1, user2)
-        share_text = await self.generate_viral_share_text(user1, user2, compatibility_score)
+        date_idea = self.get_date_idea(user1, user2, rng)
+        trait_comment = self.get_trait_comment(user1, user2, rng)
+        share_text = self._share_text(user1, user2, compatibility_score,
+                                      match_comment, date_idea, trait_comment, rng)
         
-        # Personality descriptions with comedy
-        user1_roast = random.choice(user1.get('comedy_lines', [self.get_personality_roast()]))
-        user2_roast = random.choice(user2.get('comedy_lines', [self.get_personality_roast()]))
+        # Personality descriptions with comedy (the default roast is drawn
+        # even when unused, keeping the random sequence of the original rules)
+        user1_default = self.get_personality_roast(rng)
+        user1_roast = rng.choice(user1.get('comedy_lines') or [user1_default])
+        user2_default = self.get_personality_roast(rng)
+        user2_roast = rng.choice(user2.get('comedy_lines') or [user2_default])
         
         return {
             'header': header,
@@ -226,3 +434,45 @@ Make it funny, use crypto slang/memes, and keep it light-hearted. Include releva
                 'description': user2.get('description')
             }
         }
+    
+    def render_batch(self, user: Dict[str, Any], pairs: List[Tuple[Dict[str, Any], int]],
+                     seed: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Match content for many (match analysis, score) pairs without the LLM
+        
+        Comments come from the corpus or the templates. Every random choice is
+        drawn from one Random(seed), so a given seed reproduces the batch.
+        """
+        rng = random.Random(seed)
+        contents = []
+        for match_analysis, compatibility_score in pairs:
+            key = pair_key(self._personality_id(user), self._personality_id(match_analysis), compatibility_score)
+            match_comment = (self._corpus_line('comment', key, rng)
+                             or self.get_match_comment(compatibility_score, rng))
+            contents.append(self._build_content(user, match_analysis, compatibility_score, match_comment, rng))
+        return contents
+    
+    async def generate_match_contents(self, user: Dict[str, Any],
+                                      pairs: List[Tuple[Dict[str, Any], int]]) -> List[Dict[str, Any]]:
+        """Full match content for every (match analysis, score) pair, generated concurrently"""
+        return list(await asyncio.gather(*[
+            self.generate_full_match_content(user, match_analysis, compatibility_score)
+            for match_analysis, compatibility_score in pairs
+        ]))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'use_ai': self.use_ai,
+            'ai_timeout': self.ai_timeout,
+            'ai_refill_timeout': self.ai_refill_timeout,
+            'ai_concurrency': self.ai_concurrency,
+            'ai_stream': self.ai_stream,
+            'ai_ttft_ms': summarize_ms(self._ttft_ms),
+            'ai_latency_ms': summarize_ms(self._latency_ms),
+            'cache': self.cache.get_stats(),
+            'corpus': self.corpus.get_stats() if self.corpus is not None else None
+        }
+    
+    async def close(self) -> None:
+        await self.cache.close()
@@ -2,8 +2,8 @@
 Database models and connection handling for Crypto Compatibility Engine
 """
 import os
-from datetime import datetime
-from typing import Optional, Dict, Any
+import json
+from typing import Optional, Dict, Any, List, Tuple
 import asyncpg
 from dotenv import load_dotenv
 
@@ -23,10 +23,29 @@ class Database:
             self.database_url,
             min_size=2,
             max_size=10,
-            command_timeout=60
+            command_timeout=60,
+            init=self._init_connection
         )
         await self.create_tables()
     
+    async def _init_connection(self, conn):
+        """Encode/decode JSON columns as Python dicts (binary format, so COPY works too)"""
+        await conn.set_type_codec(
+            'json',
+            encoder=lambda value: json.dumps(value).encode(),
+            decoder=lambda data: json.loads(data),
+            schema='pg_catalog',
+            format='binary'
+        )
+        # jsonb's binary format is a version byte followed by the JSON text
+        await conn.set_type_codec(
+            'jsonb',
+            encoder=lambda value: b'\x01' + json.dumps(value).encode(),
+            decoder=lambda data: json.loads(data[1:]),
+            schema='pg_catalog',
+            format='binary'
+        )
+    
     async def disconnect(self):
         """Close database connection pool"""
         if self.pool:
@@ -80,12 +99,55 @@ class Database:
                 )
             """)
             
+            # Precomputed match candidates per user
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS candidate_pools (
+                    user_fid BIGINT PRIMARY KEY,
+                    candidate_count INTEGER DEFAULT 0,
+                    refreshed_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+            
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS candidate_pool_members (
+                    user_fid BIGINT REFERENCES candidate_pools(user_fid) ON DELETE CASCADE,
+                    candidate_fid BIGINT,
+                    personality_type VARCHAR(50),
+                    personality_scores JSONB,
+                    profile JSONB,
+                    refreshed_at TIMESTAMP DEFAULT NOW(),
+                    PRIMARY KEY (user_fid, candidate_fid)
+                )
+            """)
+            
+            # Hourly rollups for the analytics summary (metric = users | matches | events)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS analytics_rollup_hourly (
+                    bucket TIMESTAMP,
+                    metric VARCHAR(20),
+                    dimension VARCHAR(50),
+                    count BIGINT DEFAULT 0,
+                    PRIMARY KEY (bucket, metric, dimension)
+                )
+            """)
+            
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS analytics_rollup_state (
+                    name VARCHAR(50) PRIMARY KEY,
+                    rolled_up_to TIMESTAMP
+                )
+            """)
+            
             # Create indexes
             await conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_matches_user_fid ON matches(user_fid);
                 CREATE INDEX IF NOT EXISTS idx_matches_compatibility ON matches(compatibility_score DESC);
                 CREATE INDEX IF NOT EXISTS idx_analytics_event_type ON analytics(event_type);
                 CREATE INDEX IF NOT EXISTS idx_analytics_created_at ON analytics(created_at);
+                CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at);
+                CREATE INDEX IF NOT EXISTS idx_candidate_pools_refreshed_at ON candidate_pools(refreshed_at);
+                CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at);
+                CREATE INDEX IF NOT EXISTS idx_matches_created_at ON matches(created_at);
             """)
     
     async def save_user(self, fid: int, username: str, personality_type: str, 
@@ -125,6 +187,46 @@ class Database:
                     created_at = NOW()
             """, user_fid, match_fid, compatibility_score, match_details)
     
+    async def save_matches_bulk(self, user_fid: int, matches: List[Dict[str, Any]],
+                                analytics_event: Optional[str] = None,
+                                analytics_data: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Save a whole match result set in one statement
+        
+        The rows are sent as parallel arrays and upserted with a single
+        INSERT ... SELECT FROM unnest(...). The optional analytics event is
+        written in the same transaction.
+        """
+        # One row per match_fid (ON CONFLICT can't touch a row twice per statement)
+        rows = {}
+        for match in matches:
+            rows.setdefault(match['match_fid'], match)
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    INSERT INTO matches (user_fid, match_fid, compatibility_score, match_details)
+                    SELECT $1, m.match_fid, m.compatibility_score, m.match_details::jsonb
+                    FROM unnest($2::BIGINT[], $3::INTEGER[], $4::TEXT[])
+                        AS m(match_fid, compatibility_score, match_details)
+                    ON CONFLICT (user_fid, match_fid)
+                    DO UPDATE SET 
+                        compatibility_score = EXCLUDED.compatibility_score,
+                        match_details = EXCLUDED.match_details,
+                        created_at = NOW()
+                """,
+                    user_fid,
+                    list(rows.keys()),
+                    [match['compatibility_score'] for match in rows.values()],
+                    [json.dumps(match, default=str) for match in rows.values()]
+                )
+                
+                if analytics_event:
+                    await conn.execute("""
+                        INSERT INTO analytics (event_type, fid, event_data)
+                        VALUES ($1, $2, $3)
+                    """, analytics_event, user_fid, analytics_data or {})
+    
     async def get_top_matches(self, user_fid: int, limit: int = 5) -> list:
         """Get top matches for a user"""
         async with self.pool.acquire() as conn:
@@ -138,46 +240,126 @@ class Database:
             """, user_fid, limit)
             return [dict(row) for row in rows]
     
-    async def check_rate_limit(self, fid: int, max_requests: int = 100) -> bool:
-        """Check if user has exceeded rate limit"""
+    async def save_candidate_pool(self, user_fid: int, candidates: List[Dict[str, Any]]) -> None:
+        """
+        Replace a user's precomputed candidate pool
+        
+        Each candidate needs: fid, personality_type, scores and profile.
+        Members are upserted and anything no longer in the pool is removed.
+        """
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow("""
-                SELECT request_count, last_reset 
-                FROM rate_limits 
-                WHERE fid = $1
-            """, fid)
-            
-            now = datetime.now()
-            
-            if not row:
-                # First request
+            async with conn.transaction():
                 await conn.execute("""
-                    INSERT INTO rate_limits (fid, request_count, last_reset)
-                    VALUES ($1, 1, $2)
-                """, fid, now)
-                return True
-            
-            # Check if 24 hours have passed
-            time_diff = (now - row['last_reset']).total_seconds()
-            if time_diff > 86400:  # 24 hours
-                # Reset counter
+                    INSERT INTO candidate_pools (user_fid, candidate_count, refreshed_at)
+                    VALUES ($1, $2, NOW())
+                    ON CONFLICT (user_fid)
+                    DO UPDATE SET
+                        candidate_count = EXCLUDED.candidate_count,
+                        refreshed_at = NOW()
+                """, user_fid, len(candidates))
+                
+                await conn.executemany("""
+                    INSERT INTO candidate_pool_members
+                        (user_fid, candidate_fid, personality_type, personality_scores, profile, refreshed_at)
+                    VALUES ($1, $2, $3, $4, $5, NOW())
+                    ON CONFLICT (user_fid, candidate_fid)
+                    DO UPDATE SET
+                        personality_type = EXCLUDED.personality_type,
+                        personality_scores = EXCLUDED.personality_scores,
+                        profile = EXCLUDED.profile,
+                        refreshed_at = NOW()
+                """, [
+                    (user_fid, c['fid'], c['personality_type'], c['scores'], c['profile'])
+                    for c in candidates
+                ])
+                
                 await conn.execute("""
-                    UPDATE rate_limits 
-                    SET request_count = 1, last_reset = $2
-                    WHERE fid = $1
-                """, fid, now)
-                return True
+                    DELETE FROM candidate_pool_members
+                    WHERE user_fid = $1 AND NOT (candidate_fid = ANY($2::BIGINT[]))
+                """, user_fid, [c['fid'] for c in candidates])
+    
+    async def get_candidate_pool(self, user_fid: int) -> Optional[Dict[str, Any]]:
+        """Get a user's precomputed candidate pool, or None if never built"""
+        async with self.pool.acquire() as conn:
+            pool_row = await conn.fetchrow("""
+                SELECT refreshed_at, EXTRACT(EPOCH FROM NOW() - refreshed_at) AS age_seconds
+                FROM candidate_pools
+                WHERE user_fid = $1
+            """, user_fid)
             
-            # Check if under limit
-            if row['request_count'] < max_requests:
-                await conn.execute("""
-                    UPDATE rate_limits 
-                    SET request_count = request_count + 1
-                    WHERE fid = $1
-                """, fid)
-                return True
+            if not pool_row:
+                return None
             
-            return False
+            rows = await conn.fetch("""
+                SELECT candidate_fid, personality_type, personality_scores, profile
+                FROM candidate_pool_members
+                WHERE user_fid = $1
+                ORDER BY candidate_fid
+            """, user_fid)
+            
+            return {
+                'refreshed_at': pool_row['refreshed_at'],
+                'age_seconds': float(pool_row['age_seconds']),
+                'candidates': [{
+                    'fid': row['candidate_fid'],
+                    'personality_type': row['personality_type'],
+                    'scores': row['personality_scores'],
+                    'profile': row['profile']
+                } for row in rows]
+            }
+    
+    async def get_stale_candidate_pools(self, max_age_seconds: int, active_days: int = 7,
+                                        limit: int = 50) -> List[int]:
+        """Active users whose candidate pool is missing or older than max_age_seconds"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT u.fid
+                FROM users u
+                LEFT JOIN candidate_pools p ON p.user_fid = u.fid
+                WHERE u.updated_at > NOW() - make_interval(days => $1)
+                  AND (p.refreshed_at IS NULL
+                       OR p.refreshed_at < NOW() - make_interval(secs => $2))
+                ORDER BY p.refreshed_at ASC NULLS FIRST
+                LIMIT $3
+            """, active_days, float(max_age_seconds), limit)
+            return [row['fid'] for row in rows]
+    
+    async def check_rate_limit(self, fid: int, max_requests: int = 100) -> bool:
+        """Check if user has exceeded rate limit"""
+        request_count, _ = await self.hit_rate_limit(fid, max_requests)
+        return request_count <= max_requests
+    
+    async def hit_rate_limit(self, fid: int, max_requests: int = 100,
+                             window_seconds: int = 86400) -> Tuple[int, float]:
+        """
+        Count one request against a fixed window, atomically
+        
+        A single upsert resets the window when it has expired and otherwise
+        increments the counter (capped at max_requests + 1). The clock is the
+        database's NOW() on both sides.
+        
+        Returns:
+            (request count including this one, seconds until the window resets)
+        """
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                INSERT INTO rate_limits AS r (fid, request_count, last_reset)
+                VALUES ($1, 1, NOW())
+                ON CONFLICT (fid)
+                DO UPDATE SET
+                    request_count = CASE
+                        WHEN r.last_reset <= NOW() - make_interval(secs => $2) THEN 1
+                        ELSE LEAST(r.request_count + 1, $3 + 1)
+                    END,
+                    last_reset = CASE
+                        WHEN r.last_reset <= NOW() - make_interval(secs => $2) THEN NOW()
+                        ELSE r.last_reset
+                    END
+                RETURNING
+                    request_count,
+                    EXTRACT(EPOCH FROM last_reset + make_interval(secs => $2) - NOW()) AS reset_in
+            """, fid, float(window_seconds), max_requests)
+            return row['request_count'], float(row['reset_in'])
     
     async def log_analytics(self, event_type: str, fid: int, event_data: Dict[str, Any]) -> None:
         """Log analytics event"""
@@ -187,36 +369,85 @@ class Database:
                 VALUES ($1, $2, $3)
             """, event_type, fid, event_data)
     
+    async def refresh_analytics_rollups(self, full: bool = False) -> None:
+        """
+        Recompute the hourly rollups
+        
+        Incremental refreshes only rewrite buckets from one hour before the last
+        watermark, so they scan just the recent rows (via the created_at indexes).
+        A full refresh rebuilds everything, which also corrects older buckets when
+        rows are deleted or a re-saved match moves to a newer hour.
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Serialize refreshes across workers
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('analytics_rollup_hourly'))")
+                
+                start = await conn.fetchval("""
+                    SELECT CASE WHEN $1 THEN '-infinity'::timestamp
+                           ELSE COALESCE(date_trunc('hour', MAX(rolled_up_to) - INTERVAL '1 hour'),
+                                         '-infinity'::timestamp)
+                           END
+                    FROM analytics_rollup_state
+                    WHERE name = 'hourly'
+                """, full)
+                
+                await conn.execute("""
+                    DELETE FROM analytics_rollup_hourly WHERE bucket >= $1
+                """, start)
+                
+                await conn.execute("""
+                    INSERT INTO analytics_rollup_hourly (bucket, metric, dimension, count)
+                    SELECT date_trunc('hour', created_at), 'users', COALESCE(personality_type, ''), COUNT(*)
+                    FROM users WHERE created_at >= $1
+                    GROUP BY 1, 3
+                    UNION ALL
+                    SELECT date_trunc('hour', created_at), 'matches', '', COUNT(*)
+                    FROM matches WHERE created_at >= $1
+                    GROUP BY 1
+                    UNION ALL
+                    SELECT date_trunc('hour', created_at), 'events', COALESCE(event_type, ''), COUNT(*)
+                    FROM analytics WHERE created_at >= $1
+                    GROUP BY 1, 3
+                """, start)
+                
+                await conn.execute("""
+                    INSERT INTO analytics_rollup_state (name, rolled_up_to)
+                    VALUES ('hourly', NOW())
+                    ON CONFLICT (name) DO UPDATE SET rolled_up_to = EXCLUDED.rolled_up_to
+                """)
+    
     async def get_analytics_summary(self, days: int = 7) -> Dict[str, Any]:
-        """Get analytics summary for past N days"""
+        """Get analytics summary for past N days (read from the hourly rollups)"""
         async with self.pool.acquire() as conn:
-            # Total users
-            total_users = await conn.fetchval("""
-                SELECT COUNT(*) FROM users
-                WHERE created_at > NOW() - INTERVAL '{} days'
-            """.format(days))
-            
-            # Total matches
-            total_matches = await conn.fetchval("""
-                SELECT COUNT(*) FROM matches
-                WHERE created_at > NOW() - INTERVAL '{} days'
-            """.format(days))
-            
-            # Popular personality types
-            personality_stats = await conn.fetch("""
-                SELECT personality_type, COUNT(*) as count
-                FROM users
-                WHERE created_at > NOW() - INTERVAL '{} days'
-                GROUP BY personality_type
-                ORDER BY count DESC
-                LIMIT 5
-            """.format(days))
-            
-            return {
-                'total_users': total_users,
-                'total_matches': total_matches,
-                'popular_personalities': [dict(row) for row in personality_stats]
-            }
+            rows = await conn.fetch("""
+                SELECT metric, dimension, SUM(count)::bigint AS count
+                FROM analytics_rollup_hourly
+                WHERE bucket >= date_trunc('hour', NOW() - make_interval(days => $1))
+                GROUP BY metric, dimension
+            """, days)
+        
+        totals = {'users': 0, 'matches': 0, 'events': 0}
+        personalities = []
+        events = {}
+        for row in rows:
+            totals[row['metric']] += row['count']
+            if row['metric'] == 'users':
+                personalities.append({
+                    'personality_type': row['dimension'] or None,
+                    'count': row['count']
+                })
+            elif row['metric'] == 'events':
+                events[row['dimension']] = row['count']
+        
+        personalities.sort(key=lambda p: (-p['count'], p['personality_type'] or ''))
+        
+        return {
+            'total_users': totals['users'],
+            'total_matches': totals['matches'],
+            'popular_personalities': personalities[:5],
+            'events_by_type': events
+        }
 
 # Global database instance
 db = Database()
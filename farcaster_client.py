@@ -2,13 +2,21 @@
 Farcaster Integration - Fetch user data and social graph
 """
 import os
+import time
+import asyncio
 import httpx
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Set, Tuple
+from urllib.parse import urlencode, urlsplit
 from dotenv import load_dotenv
+from social_graph import SocialGraphCrawler
+from single_flight import SingleFlight
 
 load_dotenv()
 
 class FarcasterClient:
+    # Maximum number of FIDs the /farcaster/user/bulk endpoint accepts per call
+    BULK_USER_BATCH_SIZE = 100
+    
     def __init__(self):
         self.api_key = os.getenv('FARCASTER_API_KEY')
         self.base_url = "https://api.neynar.com/v2"
@@ -16,89 +24,244 @@ class FarcasterClient:
             "accept": "application/json",
             "api_key": self.api_key
         } if self.api_key else {}
+        self.timeout = 30.0
+        
+        # Connection pool settings (shared by every request this client makes)
+        self.http2 = os.getenv('FARCASTER_HTTP2', 'false').lower() in ('1', 'true', 'yes')
+        self.max_connections = int(os.getenv('FARCASTER_MAX_CONNECTIONS', 100))
+        self.max_keepalive_connections = int(os.getenv('FARCASTER_MAX_KEEPALIVE', 20))
+        self.keepalive_expiry = float(os.getenv('FARCASTER_KEEPALIVE_EXPIRY', 30))
+        self.max_connections_per_host = int(os.getenv('FARCASTER_MAX_PER_HOST', 50))
+        
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2_enabled = False
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._host_in_flight: Dict[str, int] = {}
+        # Identical concurrent GETs share one request
+        self.flights = SingleFlight()
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'request_time_total': 0.0
+        }
+        
+        self.crawler = SocialGraphCrawler(self)
+    
+    async def start(self) -> None:
+        """Open the shared connection pool"""
+        if self._client is not None:
+            return
+        
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("⚠️  FARCASTER_HTTP2 is set but 'h2' is not installed - using HTTP/1.1")
+                http2 = False
+        
+        self._http2_enabled = http2
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=self.timeout,
+            headers=self.headers,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+        )
+    
+    async def close(self) -> None:
+        """Close the shared connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled client, opening it lazily outside the app lifespan"""
+        if self._client is None:
+            await self.start()
+        return self._client
+    
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """Per-host concurrency limit on top of the global pool size"""
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_limits[host]
+    
+    async def _get(self, path: str, params: Dict[str, Any], route: Optional[str] = None) -> httpx.Response:
+        """
+        Issue a GET against the API through the shared pool (coalescing identical GETs)
+        
+        route is the path template for the stats (defaults to path); pass it
+        whenever the path embeds an ID.
+        """
+        key = f"{path}:{urlencode(sorted(params.items()))}"
+        return await self.flights.do(route or path, key, lambda: self._request(path, params))
+    
+    async def _request(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        client = await self._get_client()
+        url = f"{self.base_url}{path}"
+        host = urlsplit(url).netloc
+        stats = self._stats
+        
+        wait_started = time.perf_counter()
+        async with self._host_limit(url):
+            waited = time.perf_counter() - wait_started
+            stats['wait_time_total'] += waited
+            stats['wait_time_max'] = max(stats['wait_time_max'], waited)
+            stats['requests'] += 1
+            stats['in_flight'] += 1
+            stats['peak_in_flight'] = max(stats['peak_in_flight'], stats['in_flight'])
+            self._host_in_flight[host] = self._host_in_flight.get(host, 0) + 1
+            
+            started = time.perf_counter()
+            try:
+                return await client.get(url, params=params)
+            except Exception:
+                stats['errors'] += 1
+                raise
+            finally:
+                stats['in_flight'] -= 1
+                self._host_in_flight[host] -= 1
+                stats['request_time_total'] += time.perf_counter() - started
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection pool metrics"""
+        stats = self._stats
+        requests = stats['requests']
         
+        return {
+            'started': self._client is not None,
+            'http2': self._http2_enabled,
+            'max_connections': self.max_connections,
+            'max_keepalive_connections': self.max_keepalive_connections,
+            'max_connections_per_host': self.max_connections_per_host,
+            'requests_in_flight': stats['in_flight'],
+            # Each in-flight request holds one of its host's per-host slots
+            'requests_in_flight_by_host': {host: n for host, n in self._host_in_flight.items() if n},
+            'peak_requests_in_flight': stats['peak_in_flight'],
+            'requests': requests,
+            'errors': stats['errors'],
+            'avg_wait_ms': round(stats['wait_time_total'] / requests * 1000, 3) if requests else 0.0,
+            'max_wait_ms': round(stats['wait_time_max'] * 1000, 3),
+            'avg_request_ms': round(stats['request_time_total'] / requests * 1000, 3) if requests else 0.0
+        }
+    
     async def get_user_by_fid(self, fid: int) -> Optional[Dict[str, Any]]:
         """Get user information by FID"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/farcaster/user/bulk",
-                    params={"fids": str(fid)},
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    users = data.get('users', [])
-                    if users:
-                        return self._format_user_data(users[0])
-                return None
-                
+            response = await self._get("/farcaster/user/bulk", {"fids": str(fid)})
+            
+            if response.status_code == 200:
+                data = response.json()
+                users = data.get('users', [])
+                if users:
+                    return self._format_user_data(users[0])
+            return None
+        
         except Exception as e:
             print(f"Error fetching user {fid}: {e}")
             return None
     
+    async def get_users_bulk(self, fids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Get user information for many FIDs, chunked to the bulk endpoint's limit"""
+        users, _ = await self.fetch_users_bulk(fids)
+        return users
+    
+    async def fetch_users_bulk(self, fids: List[int]) -> Tuple[Dict[int, Dict[str, Any]], Set[int]]:
+        """
+        Users found for many FIDs, plus the FIDs whose request failed
+        
+        A FID missing from the users but not in the failed set does not exist;
+        a failed FID (non-200, rate limit, network error) is simply unknown.
+        """
+        unique_fids = list(dict.fromkeys(fids))
+        chunks = [
+            unique_fids[i:i + self.BULK_USER_BATCH_SIZE]
+            for i in range(0, len(unique_fids), self.BULK_USER_BATCH_SIZE)
+        ]
+        
+        results = await asyncio.gather(*[self._get_users_chunk(chunk) for chunk in chunks])
+        
+        users = {}
+        failed = set()
+        for chunk, chunk_users in zip(chunks, results):
+            if chunk_users is None:
+                failed.update(chunk)
+            else:
+                users.update(chunk_users)
+        return users, failed
+    
+    async def _get_users_chunk(self, fids: List[int]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Fetch one bulk endpoint page of users (None if the request failed)"""
+        try:
+            response = await self._get(
+                "/farcaster/user/bulk",
+                {"fids": ",".join(str(fid) for fid in fids)}
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                users = [self._format_user_data(user) for user in data.get('users', [])]
+                return {user['fid']: user for user in users if user.get('fid')}
+            print(f"Bulk user fetch for {len(fids)} FIDs returned HTTP {response.status_code}")
+            return None
+        
+        except Exception as e:
+            print(f"Error fetching users {fids[0]}..{fids[-1]} ({len(fids)} FIDs): {e}")
+            return None
+    
     async def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Get user information by username"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/farcaster/user/search",
-                    params={"q": username},
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    users = data.get('result', {}).get('users', [])
-                    if users:
-                        return self._format_user_data(users[0])
-                return None
-                
+            response = await self._get("/farcaster/user/search", {"q": username})
+            
+            if response.status_code == 200:
+                data = response.json()
+                users = data.get('result', {}).get('users', [])
+                if users:
+                    return self._format_user_data(users[0])
+            return None
+        
         except Exception as e:
             print(f"Error fetching user {username}: {e}")
             return None
     
-    async def get_user_casts(self, fid: int, limit: int = 25) -> List[Dict[str, Any]]:
-        """Get recent casts from a user"""
+    async def get_user_casts(self, fid: int, limit: int = 25) -> Optional[List[Dict[str, Any]]]:
+        """Get recent casts from a user (None if the request failed)"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/farcaster/feed/user/{fid}",
-                    params={"limit": limit},
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    casts = data.get('casts', [])
-                    return [self._format_cast_data(cast) for cast in casts]
-                return []
-                
+            response = await self._get(f"/farcaster/feed/user/{fid}", {"limit": limit},
+                                       route="/farcaster/feed/user/{fid}")
+            
+            if response.status_code == 200:
+                data = response.json()
+                casts = data.get('casts', [])
+                return [self._format_cast_data(cast) for cast in casts]
+            print(f"Cast fetch for {fid} returned HTTP {response.status_code}")
+            return None
+        
         except Exception as e:
             print(f"Error fetching casts for {fid}: {e}")
-            return []
+            return None
     
     async def get_user_followers(self, fid: int, limit: int = 100) -> List[int]:
         """Get list of user's followers (FIDs)"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/farcaster/followers",
-                    params={"fid": fid, "limit": limit},
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    users = data.get('users', [])
-                    return [user.get('fid') for user in users if user.get('fid')]
-                return []
-                
+            response = await self._get("/farcaster/followers", {"fid": fid, "limit": limit})
+            
+            if response.status_code == 200:
+                data = response.json()
+                users = data.get('users', [])
+                return [user.get('fid') for user in users if user.get('fid')]
+            return []
+        
         except Exception as e:
             print(f"Error fetching followers for {fid}: {e}")
             return []
@@ -106,66 +269,146 @@ class FarcasterClient:
     async def get_user_following(self, fid: int, limit: int = 100) -> List[int]:
         """Get list of users that this user follows (FIDs)"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/farcaster/following",
-                    params={"fid": fid, "limit": limit},
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    users = data.get('users', [])
-                    return [user.get('fid') for user in users if user.get('fid')]
-                return []
-                
+            response = await self._get("/farcaster/following", {"fid": fid, "limit": limit})
+            
+            if response.status_code == 200:
+                data = response.json()
+                users = data.get('users', [])
+                return [user.get('fid') for user in users if user.get('fid')]
+            return []
+        
         except Exception as e:
             print(f"Error fetching following for {fid}: {e}")
             return []
     
-    async def get_mutual_connections(self, fid: int) -> List[int]:
-        """Get users that both follow each other"""
+    def iter_followers(self, fid: int, page_size: int = 100, max_items: Optional[int] = None,
+                       prefetch: int = 1) -> AsyncIterator[int]:
+        """Stream all of a user's followers (FIDs), following the API cursor"""
+        return self._iter_graph("/farcaster/followers", fid, page_size, max_items, prefetch)
+    
+    def iter_following(self, fid: int, page_size: int = 100, max_items: Optional[int] = None,
+                       prefetch: int = 1) -> AsyncIterator[int]:
+        """Stream all users this user follows (FIDs), following the API cursor"""
+        return self._iter_graph("/farcaster/following", fid, page_size, max_items, prefetch)
+    
+    async def _iter_graph(self, path: str, fid: int, page_size: int,
+                          max_items: Optional[int], prefetch: int) -> AsyncIterator[int]:
+        """
+        Stream FIDs page by page
+        
+        A background task fetches at most `prefetch` pages ahead into a bounded
+        queue, so fetching pauses whenever the consumer falls behind. Stopping
+        early (max_items, break + aclose()) cancels any pending fetch.
+        """
+        pages: asyncio.Queue = asyncio.Queue(maxsize=max(1, prefetch))
+        
+        async def produce():
+            cursor = None
+            try:
+                while True:
+                    fids, cursor = await self._fetch_graph_page(path, fid, page_size, cursor)
+                    if fids:
+                        await pages.put(fids)
+                    if not cursor or not fids:
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error streaming {path} for {fid}: {e}")
+            await pages.put(None)
+        
+        producer = asyncio.create_task(produce())
+        yielded = 0
+        try:
+            while True:
+                page = await pages.get()
+                if page is None:
+                    return
+                for found in page:
+                    yield found
+                    yielded += 1
+                    if max_items and yielded >= max_items:
+                        return
+        finally:
+            producer.cancel()
+    
+    async def _fetch_graph_page(self, path: str, fid: int, page_size: int,
+                                cursor: Optional[str]) -> Tuple[List[int], Optional[str]]:
+        """Fetch one followers/following page; returns (fids, next cursor)"""
+        params = {"fid": fid, "limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        
+        response = await self._get(path, params)
+        if response.status_code != 200:
+            return [], None
+        
+        data = response.json()
+        fids = []
+        for item in data.get('users', []):
+            # Entries are either users or {"object": "follow", "user": {...}}
+            found = item.get('fid') or item.get('user', {}).get('fid')
+            if found:
+                fids.append(found)
+        return fids, (data.get('next') or {}).get('cursor')
+    
+    async def get_mutual_connections(self, fid: int, max_items: Optional[int] = None,
+                                     page_size: int = 100) -> List[int]:
+        """
+        Get users that both follow each other
+        
+        Streams the smaller side (by profile counts) into a set, then pages
+        through the larger side against it, so only one side is ever held in
+        memory. The larger side is fetched one page at a time and only while
+        some of the smaller side is still unmatched.
+        """
         try:
-            followers = await self.get_user_followers(fid)
-            following = await self.get_user_following(fid)
+            profile = await self.get_user_by_fid(fid)
+            if profile and profile.get('following_count', 0) < profile.get('follower_count', 0):
+                smaller_side, larger_path = self.iter_following, "/farcaster/followers"
+            else:
+                smaller_side, larger_path = self.iter_followers, "/farcaster/following"
+            
+            remaining = set()
+            async for found in smaller_side(fid, page_size=page_size, max_items=max_items):
+                remaining.add(found)
+            if not remaining:
+                return []
             
             # Find mutual connections
-            mutuals = list(set(followers) & set(following))
+            mutuals = []
+            cursor = None
+            seen = 0
+            while remaining:
+                page, cursor = await self._fetch_graph_page(larger_path, fid, page_size, cursor)
+                if max_items:
+                    page = page[:max_items - seen]
+                seen += len(page)
+                for found in page:
+                    if found in remaining:
+                        mutuals.append(found)
+                        remaining.discard(found)
+                if not cursor or not page or (max_items and seen >= max_items):
+                    break
             return mutuals
-            
+        
         except Exception as e:
             print(f"Error getting mutual connections for {fid}: {e}")
             return []
     
-    async def get_social_graph_connections(self, fid: int, depth: int = 2) -> List[int]:
+    async def get_social_graph_connections(self, fid: int, depth: int = 2,
+                                           **crawl_options) -> List[int]:
         """
         Get connections from social graph
         depth=1: direct following
         depth=2: following + their following
+        
+        Levels are fetched concurrently; see SocialGraphCrawler.crawl for
+        fan_out, sampling and target_count options.
         """
         try:
-            connections = set()
-            
-            # Get direct following
-            following = await self.get_user_following(fid, limit=150)
-            connections.update(following)
-            
-            if depth >= 2 and following:
-                # Get second-degree connections (sample to avoid rate limits)
-                sample_size = min(10, len(following))
-                import random
-                sampled_following = random.sample(following, sample_size)
-                
-                for friend_fid in sampled_following:
-                    friend_following = await self.get_user_following(friend_fid, limit=50)
-                    connections.update(friend_following)
-            
-            # Remove self
-            connections.discard(fid)
-            
-            return list(connections)
-            
+            return await self.crawler.crawl(fid, depth=depth, **crawl_options)
+        
         except Exception as e:
             print(f"Error getting social graph for {fid}: {e}")
             return []
@@ -207,7 +450,7 @@ class FarcasterClient:
         recent_casts = await self.get_user_casts(fid, limit=25)
         
         # Combine all data
-        user_data['recent_casts'] = recent_casts
+        user_data['recent_casts'] = recent_casts or []
         
         # You can add NFT and token holdings here if you have those APIs
         # user_data['nft_holdings'] = await self.get_nft_holdings(user_data['verified_addresses'])
@@ -241,6 +484,10 @@ class MockFarcasterClient(FarcasterClient):
             'verified_addresses': {}
         }
     
+    async def fetch_users_bulk(self, fids: List[int]) -> Tuple[Dict[int, Dict[str, Any]], Set[int]]:
+        """Return mock user data for many FIDs (mock requests never fail)"""
+        return {fid: await self.get_user_by_fid(fid) for fid in dict.fromkeys(fids)}, set()
+    
     async def get_user_casts(self, fid: int, limit: int = 25) -> List[Dict[str, Any]]:
         """Return mock casts"""
         cast_templates = [
@@ -261,10 +508,35 @@ class MockFarcasterClient(FarcasterClient):
             'recasts_count': i
         } for i in range(min(limit, 10))]
     
-    async def get_social_graph_connections(self, fid: int, depth: int = 2) -> List[int]:
+    async def get_user_following(self, fid: int, limit: int = 100) -> List[int]:
+        """Return mock following list"""
+        import random
+        rng = random.Random(fid)
+        return [rng.randint(1000, 9999) for _ in range(min(limit, rng.randint(20, 100)))]
+    
+    async def get_user_followers(self, fid: int, limit: int = 100) -> List[int]:
+        """Return mock followers list"""
+        import random
+        rng = random.Random(f'followers:{fid}')
+        return [rng.randint(1000, 9999) for _ in range(min(limit, rng.randint(20, 100)))]
+    
+    async def _fetch_graph_page(self, path: str, fid: int, page_size: int,
+                                cursor: Optional[str]) -> Tuple[List[int], Optional[str]]:
+        """Return one page of the mock followers/following lists"""
+        if path.endswith('/followers'):
+            fids = await self.get_user_followers(fid)
+        else:
+            fids = await self.get_user_following(fid)
+        
+        offset = int(cursor or 0)
+        next_offset = offset + page_size
+        return fids[offset:next_offset], str(next_offset) if next_offset < len(fids) else None
+    
+    async def get_social_graph_connections(self, fid: int, depth: int = 2,
+                                           **crawl_options) -> List[int]:
         """Return mock connections"""
         # Generate some random FIDs as connections
         import random
         random.seed(fid)
         num_connections = random.randint(20, 100)
-        return [random.randint(1000, 9999) for _ in range(num_connections)]
+        return [random.randint(1000, 9999) for _ in range(num_connections)]
\ No newline at end of file
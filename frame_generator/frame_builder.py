@@ -4,10 +4,25 @@ Frame Generator - Build Farcaster Frames v2 for interactive experience
 from typing import Dict, Any, List, Optional
 import base64
 import json
+import os
+from datetime import date
+
+from frame_generator.image_renderer import render_inputs
+from frame_generator.state_token import StateTokenCodec
 
 class FrameGenerator:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, secret_key: Optional[str] = None):
         self.base_url = base_url.rstrip('/')
+        
+        secret_key = secret_key or os.getenv('SECRET_KEY')
+        if not secret_key:
+            print("⚠️  SECRET_KEY not set - image state tokens use an insecure development key")
+            secret_key = 'dev-secret-key'
+        self.state_tokens = StateTokenCodec(secret_key)
+        
+        # Unsigned base64 JSON image URLs (pre state token) are only accepted until this date
+        legacy_until = os.getenv('LEGACY_IMAGE_STATE_UNTIL', '').strip()
+        self.legacy_state_until = date.fromisoformat(legacy_until) if legacy_until else None
     
     def generate_start_frame(self) -> Dict[str, Any]:
         """Generate initial frame to start the compatibility check"""
@@ -53,7 +68,7 @@ class FrameGenerator:
         
         return {
             "version": "next",
-            "image": f"{self.base_url}/api/generate-image/personality?data={self._encode_data(analysis)}",
+            "image": f"{self.base_url}/api/generate-image/personality?data={self.state_tokens.encode('personality', analysis)}",
             "buttons": [
                 {
                     "label": f"{emoji} I'm a {personality_name}!",
@@ -113,7 +128,7 @@ class FrameGenerator:
         
         return {
             "version": "next",
-            "image": f"{self.base_url}/api/generate-image/match?data={self._encode_data(match)}",
+            "image": f"{self.base_url}/api/generate-image/match?data={self.state_tokens.encode('match', match)}",
             "buttons": buttons[:4],  # Max 4 buttons
             "post_url": f"{self.base_url}/api/match/{current_index}",
             "image_aspect_ratio": "1:1"
@@ -123,7 +138,7 @@ class FrameGenerator:
         """Frame showing detailed match analysis"""
         return {
             "version": "next",
-            "image": f"{self.base_url}/api/generate-image/details?data={self._encode_data(match_data)}",
+            "image": f"{self.base_url}/api/generate-image/details?data={self.state_tokens.encode('details', match_data)}",
             "buttons": [
                 {
                     "label": "⬅️ Back to Matches",
@@ -152,7 +167,7 @@ class FrameGenerator:
         
         return {
             "version": "next",
-            "image": f"{self.base_url}/api/generate-image/share?data={self._encode_data(share_data)}",
+            "image": f"{self.base_url}/api/generate-image/share?data={self.state_tokens.encode('share', share_data)}",
             "buttons": [
                 {
                     "label": "🚀 Try It Yourself!",
@@ -253,6 +268,20 @@ class FrameGenerator:
             "image_aspect_ratio": "1:1"
         }
     
+    def decode_image_state(self, kind: str, data: str) -> Optional[Dict[str, Any]]:
+        """Render inputs for an image URL's data parameter, or None if it isn't a valid token"""
+        inputs = self.state_tokens.decode(kind, data)
+        if inputs is not None:
+            return inputs
+        
+        # URLs shared before state tokens carry unsigned base64 JSON of the whole dict
+        if self.legacy_state_until is None or date.today() > self.legacy_state_until:
+            return None
+        legacy = self._decode_data(data)
+        if not isinstance(legacy, dict) or not legacy:
+            return None
+        return render_inputs(kind, legacy)
+    
     def _encode_data(self, data: Dict[str, Any]) -> str:
         """Encode data for URL transmission"""
         json_str = json.dumps(data)
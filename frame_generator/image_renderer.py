@@ -0,0 +1,412 @@
+"""
+Image Renderer - Draw the personality, match, details and share cards with Pillow
+
+Rendering runs in a process pool so the event loop never blocks on drawing.
+Output is content addressed: the key is a hash of exactly the fields a card
+draws (plus RENDERER_VERSION), cached in memory and on disk, and doubles as
+a strong ETag. Both caches are capped; the disk cache evicts the least
+recently used files (oldest mtime - reads touch the file) once over its cap.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Bump whenever the drawing code changes so cached images are not reused
+RENDERER_VERSION = 1
+
+CARD_KINDS = ('personality', 'match', 'details', 'share')
+CARD_SIZE = (600, 600)
+
+FONT_PATHS = {
+    True: "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    False: "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+}
+
+BACKGROUNDS = {
+    'personality': ('#8b5cf6', '#4c1d95'),
+    'match': ('#ec4899', '#7c3aed'),
+    'details': ('#6366f1', '#1e1b4b'),
+    'share': ('#f59e0b', '#db2777')
+}
+
+SCORE_LABELS = {
+    'token_preference_btc': 'Bitcoin',
+    'token_preference_eth': 'Ethereum',
+    'risk_tolerance': 'Risk',
+    'nft_interest': 'NFTs',
+    'defi_engagement': 'DeFi',
+    'meme_coin_tolerance': 'Memes'
+}
+
+BREAKDOWN_LABELS = {
+    'personality_match': 'Personality',
+    'trait_match': 'Traits',
+    'token_preference_match': 'Tokens',
+    'risk_tolerance_match': 'Risk'
+}
+
+# Field order of each card's render inputs (state tokens pack them positionally)
+CARD_FIELDS = {
+    'personality': ('username', 'name', 'description', 'scores'),
+    'match': ('match_username', 'match_personality', 'score', 'header', 'comment'),
+    'details': ('match_username', 'match_personality', 'score', 'header',
+                'breakdown', 'date_idea', 'trait_comment'),
+    'share': ('match_username', 'match_personality', 'score', 'header', 'share_text')
+}
+
+# Nested score maps and the keys they may contain
+NESTED_FIELDS = {
+    'scores': tuple(SCORE_LABELS),
+    'breakdown': tuple(BREAKDOWN_LABELS)
+}
+
+
+# ============================================================================
+# Render inputs (what each card draws - also what the cache key hashes)
+# ============================================================================
+
+def render_inputs(kind: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a decoded frame payload to the fields the card actually draws"""
+    if kind not in CARD_KINDS:
+        raise ValueError(f"Unknown card kind: {kind}")
+    
+    if kind == 'personality':
+        scores = data.get('scores') or {}
+        return {
+            'username': data.get('username', ''),
+            'name': data.get('personality_name', 'Crypto Enthusiast'),
+            'description': data.get('description', ''),
+            'scores': {key: scores[key] for key in SCORE_LABELS if key in scores}
+        }
+    
+    comedy = data.get('comedy_content') or {}
+    match_analysis = data.get('match_analysis') or {}
+    inputs = {
+        'match_username': data.get('match_username', ''),
+        'match_personality': match_analysis.get('personality_name', ''),
+        'score': data.get('compatibility_score', comedy.get('compatibility_score', 0)),
+        'header': comedy.get('header', '')
+    }
+    
+    if kind == 'match':
+        inputs['comment'] = comedy.get('match_comment', '')
+    elif kind == 'details':
+        breakdown = data.get('breakdown') or {}
+        inputs['breakdown'] = {key: breakdown[key] for key in BREAKDOWN_LABELS if key in breakdown}
+        inputs['date_idea'] = comedy.get('date_idea', '')
+        inputs['trait_comment'] = comedy.get('trait_comment', '')
+    else:
+        inputs['share_text'] = comedy.get('share_text', 'Found my crypto soulmate!')
+    
+    return inputs
+
+
+def render_key(kind: str, inputs: Dict[str, Any]) -> str:
+    payload = json.dumps([RENDERER_VERSION, kind, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+# ============================================================================
+# Drawing (module level functions so they can run in worker processes)
+# ============================================================================
+
+@lru_cache(maxsize=32)
+def _font(size: int, bold: bool = False):
+    try:
+        return ImageFont.truetype(FONT_PATHS[bold], size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+
+def _clean(text: Any) -> str:
+    """Drop characters the fonts can't draw (emoji and variation selectors)"""
+    return ''.join(ch for ch in str(text) if ord(ch) <= 0xFFFF and not 0xFE00 <= ord(ch) <= 0xFE0F).strip()
+
+
+def _wrap(draw: ImageDraw.ImageDraw, text: str, font, width: int, max_lines: int) -> List[str]:
+    lines = []
+    current = ''
+    for word in _clean(text).split():
+        candidate = f"{current} {word}".strip()
+        if current and draw.textlength(candidate, font=font) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1].rstrip('.,;') + '...'
+    return lines
+
+
+@lru_cache(maxsize=len(CARD_KINDS))
+def _gradient(kind: str) -> Image.Image:
+    top, bottom = (Image.new('RGB', (1, 1), color).getpixel((0, 0)) for color in BACKGROUNDS[kind])
+    strip = Image.new('RGB', (1, CARD_SIZE[1]))
+    for y in range(CARD_SIZE[1]):
+        t = y / (CARD_SIZE[1] - 1)
+        strip.putpixel((0, y), tuple(int(a + (b - a) * t) for a, b in zip(top, bottom)))
+    return strip.resize(CARD_SIZE)
+
+
+def _centered(draw: ImageDraw.ImageDraw, y: int, text: str, size: int, bold: bool = False) -> int:
+    """Draw one centered line and return the y of the next one"""
+    font = _font(size, bold)
+    text = _clean(text)
+    x = (CARD_SIZE[0] - draw.textlength(text, font=font)) / 2
+    draw.text((x, y), text, font=font, fill='white')
+    return y + size + 10
+
+
+def _paragraph(draw: ImageDraw.ImageDraw, y: int, text: str, size: int, max_lines: int) -> int:
+    for line in _wrap(draw, text, _font(size), CARD_SIZE[0] - 80, max_lines):
+        y = _centered(draw, y, line, size)
+    return y
+
+
+def _bar_value(value: Any) -> int:
+    """A 0-100 bar length from whatever the state carried (0 if it isn't a number)"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0
+    if math.isnan(number):
+        return 0
+    return int(max(0.0, min(100.0, number)))
+
+
+def _bars(draw: ImageDraw.ImageDraw, y: int, values: Dict[str, Any], labels: Dict[str, str]) -> int:
+    font = _font(20)
+    for key, label in labels.items():
+        if key not in values:
+            continue
+        value = _bar_value(values[key])
+        draw.text((50, y), label, font=font, fill='white')
+        draw.rounded_rectangle((200, y + 4, 500, y + 22), radius=9, fill=(255, 255, 255, 60), outline='white')
+        if value:
+            draw.rounded_rectangle((200, y + 4, 200 + 3 * value, y + 22), radius=9, fill='white')
+        draw.text((515, y), f"{value}", font=font, fill='white')
+        y += 36
+    return y
+
+
+def render_card(kind: str, inputs: Dict[str, Any]) -> bytes:
+    """Draw one card and return it as PNG bytes"""
+    image = _gradient(kind).copy()
+    draw = ImageDraw.Draw(image, 'RGBA')
+    
+    if kind == 'personality':
+        y = _centered(draw, 40, f"@{inputs['username']}" if inputs['username'] else 'You are a', 24)
+        y = _centered(draw, y + 10, inputs['name'], 40, bold=True)
+        y = _paragraph(draw, y + 10, inputs['description'], 20, 3)
+        _bars(draw, y + 30, inputs['scores'], SCORE_LABELS)
+    else:
+        y = _centered(draw, 30, inputs['header'] or 'Crypto Compatibility', 26, bold=True)
+        y = _centered(draw, y + 5, f"{inputs['score']}%", 96, bold=True)
+        match_line = f"with @{inputs['match_username']}" if inputs['match_username'] else ''
+        if inputs['match_personality']:
+            match_line = f"{match_line} ({inputs['match_personality']})".strip()
+        y = _centered(draw, y + 5, match_line, 22)
+        
+        if kind == 'match':
+            _paragraph(draw, y + 25, inputs['comment'], 22, 6)
+        elif kind == 'details':
+            y = _bars(draw, y + 20, inputs['breakdown'], BREAKDOWN_LABELS)
+            y = _paragraph(draw, y + 10, inputs['trait_comment'], 18, 2)
+            _paragraph(draw, y + 5, inputs['date_idea'], 18, 3)
+        else:
+            _paragraph(draw, y + 25, inputs['share_text'], 22, 6)
+    
+    _centered(draw, CARD_SIZE[1] - 45, 'Crypto Compatibility Engine', 18)
+    
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=False)
+    return output.getvalue()
+
+
+# ============================================================================
+# Renderer with memory + disk cache
+# ============================================================================
+
+class ImageRenderer:
+    def __init__(self, cache_dir: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_memory_bytes: Optional[int] = None, max_disk_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir if cache_dir is not None else os.getenv('IMAGE_CACHE_DIR', 'data/image_cache')
+        # 0 workers renders in a thread instead (e.g. where subprocesses are unavailable)
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv('IMAGE_RENDER_WORKERS', 2))
+        self.max_memory_bytes = max_memory_bytes or int(os.getenv('IMAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.max_disk_bytes = max_disk_bytes or int(os.getenv('IMAGE_DISK_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # Disk usage, measured on the first write and then tracked (disk I/O runs in threads)
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'disk_evictions': 0,
+            'renders': 0,
+            'render_errors': 0,
+            'render_time_total': 0.0
+        }
+    
+    def start(self) -> None:
+        """Create the worker pool (otherwise created on first render)"""
+        if self._executor is None and self.max_workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+    
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def etag(self, kind: str, inputs: Dict[str, Any]) -> str:
+        """ETag a card will have, without rendering it (for conditional requests)"""
+        return f'"{render_key(kind, inputs)}"'
+    
+    async def render(self, kind: str, inputs: Dict[str, Any]) -> Tuple[bytes, str]:
+        """PNG bytes and strong ETag for a card, from its render_inputs()"""
+        key = render_key(kind, inputs)
+        etag = f'"{key}"'
+        
+        png = self._memory.get(key)
+        if png is not None:
+            self._memory.move_to_end(key)
+            self._stats['memory_hits'] += 1
+            return png, etag
+        
+        png = await asyncio.to_thread(self._read_disk, key)
+        if png is not None:
+            self._stats['disk_hits'] += 1
+        else:
+            png = await self._render(kind, inputs)
+            await asyncio.to_thread(self._write_disk, key, png)
+        
+        self._remember(key, png)
+        return png, etag
+    
+    async def _render(self, kind: str, inputs: Dict[str, Any]) -> bytes:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            self.start()
+            if self._executor is not None:
+                png = await loop.run_in_executor(self._executor, render_card, kind, inputs)
+            else:
+                png = await asyncio.to_thread(render_card, kind, inputs)
+        except Exception:
+            self._stats['render_errors'] += 1
+            raise
+        finally:
+            self._stats['render_time_total'] += loop.time() - started
+        
+        self._stats['renders'] += 1
+        return png
+    
+    def _remember(self, key: str, png: bytes) -> None:
+        if len(png) > self.max_memory_bytes:
+            return
+        self._memory[key] = png
+        self._memory_bytes += len(png)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+    
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                png = f.read()
+        except FileNotFoundError:
+            return None
+        # Touch the file so eviction by mtime follows use, not creation
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return png
+    
+    def _write_disk(self, key: str, png: bytes) -> None:
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Image cache write failed: {e}")
+            return
+        
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(png)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._prune_disk()
+    
+    def _disk_files(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every cached card on disk"""
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+    
+    def _prune_disk(self) -> None:
+        """Delete the least recently used files until the disk cache is under 90% of its cap"""
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._stats['disk_evictions'] += 1
+        self._disk_bytes = total
+    
+    def get_stats(self) -> Dict[str, Any]:
+        renders = self._stats['renders']
+        return {
+            **self._stats,
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_bytes,
+            'disk_bytes': self._disk_bytes,
+            'workers': self.max_workers,
+            'avg_render_ms': round(self._stats['render_time_total'] / renders * 1000, 3) if renders else 0.0
+        }
@@ -0,0 +1,103 @@
+"""
+State Tokens - Compact, signed frame image state
+
+Image URLs carry only the fields a card draws (see render_inputs), packed
+positionally and compressed when that helps, instead of base64 JSON of the
+whole analysis or match. Layout before base64url (no padding):
+
+    header (1 byte: version << 4 | flags) + body + HMAC-SHA256 (first 12 bytes)
+
+The MAC covers the card kind too, so a token only decodes for the card it was
+issued for.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import zlib
+from typing import Dict, Any, List, Optional
+
+from frame_generator.image_renderer import CARD_FIELDS, NESTED_FIELDS, render_inputs
+
+TOKEN_VERSION = 1
+FLAG_COMPRESSED = 0x01
+MAC_SIZE = 12
+
+# Below this body size zlib's framing costs more than it saves
+COMPRESS_MIN_BYTES = 64
+
+
+def _pack(kind: str, inputs: Dict[str, Any]) -> List[Any]:
+    values = []
+    for field in CARD_FIELDS[kind]:
+        value = inputs.get(field)
+        if field in NESTED_FIELDS:
+            value = [(value or {}).get(key) for key in NESTED_FIELDS[field]]
+            while value and value[-1] is None:
+                value.pop()
+        values.append(value)
+    return values
+
+
+def _unpack(kind: str, values: List[Any]) -> Dict[str, Any]:
+    fields = CARD_FIELDS[kind]
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError("State token does not match the card layout")
+    
+    inputs = {}
+    for field, value in zip(fields, values):
+        if field in NESTED_FIELDS:
+            value = {key: item for key, item in zip(NESTED_FIELDS[field], value) if item is not None}
+        inputs[field] = value
+    return inputs
+
+
+class StateTokenCodec:
+    def __init__(self, secret_key: str):
+        self._key = hashlib.sha256(secret_key.encode()).digest()
+    
+    def _mac(self, kind: str, message: bytes) -> bytes:
+        return hmac.new(self._key, kind.encode() + b'\0' + message, hashlib.sha256).digest()[:MAC_SIZE]
+    
+    def encode(self, kind: str, data: Dict[str, Any]) -> str:
+        """Token carrying the render inputs of a full analysis/match dict"""
+        return self.encode_inputs(kind, render_inputs(kind, data))
+    
+    def encode_inputs(self, kind: str, inputs: Dict[str, Any]) -> str:
+        body = json.dumps(_pack(kind, inputs), separators=(',', ':'), ensure_ascii=False).encode()
+        
+        flags = 0
+        if len(body) >= COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(body, 9)
+            if len(compressed) < len(body):
+                body, flags = compressed, FLAG_COMPRESSED
+        
+        message = bytes([TOKEN_VERSION << 4 | flags]) + body
+        token = message + self._mac(kind, message)
+        return base64.urlsafe_b64encode(token).decode().rstrip('=')
+    
+    def decode(self, kind: str, token: str) -> Optional[Dict[str, Any]]:
+        """Render inputs from a token, or None if it is malformed or not ours"""
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (binascii.Error, ValueError):
+            return None
+        
+        if len(raw) <= MAC_SIZE + 1:
+            return None
+        
+        message, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+        if not hmac.compare_digest(mac, self._mac(kind, message)):
+            return None
+        
+        header, body = message[0], message[1:]
+        if header >> 4 != TOKEN_VERSION:
+            return None
+        
+        try:
+            if header & FLAG_COMPRESSED:
+                body = zlib.decompress(body)
+            return _unpack(kind, json.loads(body))
+        except (zlib.error, ValueError):
+            return None
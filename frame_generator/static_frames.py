@@ -0,0 +1,100 @@
+"""
+Static Frames - Request-independent frames and the Mini App manifest, prebuilt
+
+Everything here depends only on the base URL, so it is rendered and serialized
+once at startup and served as bytes with an ETag; repeat fetches from
+Farcaster clients become 304s without touching the frame generator.
+"""
+import json
+from typing import Dict, Any, Optional, Tuple
+
+from fastapi import Request, Response
+
+from frame_generator.frame_builder import FrameGenerator
+from http_cache import make_etag, cached_response
+
+FRAME_CACHE_CONTROL = 'public, max-age=300'
+MANIFEST_CACHE_CONTROL = 'public, max-age=3600'
+
+
+def build_manifest(app_url: str) -> Dict[str, Any]:
+    """Farcaster Mini App manifest for a deployment URL"""
+    return {
+        "accountAssociation": {
+            "header": "eyJmaWQiOjAsInR5cGUiOiJjdXN0b2R5Iiwia2V5IjoiMHgwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwMDAwIn0",
+            "payload": "eyJkb21haW4iOiJjcnlwdG8tY29tcGF0aWJpbGl0eS5jb20ifQ",
+            "signature": "MHg..."
+        },
+        "frame": {
+            "version": "1",
+            "name": "Crypto Compatibility",
+            "iconUrl": f"{app_url}/static/images/icon-512.png",
+            "splashImageUrl": f"{app_url}/static/images/splash.png",
+            "splashBackgroundColor": "#667eea",
+            "homeUrl": app_url,
+            "imageUrl": f"{app_url}/static/images/og-image.png",
+            "buttonTitle": "Find Your Match",
+            "webhookUrl": f"{app_url}/api/webhook"
+        }
+    }
+
+
+class StaticFrames:
+    def __init__(self, frame_generator: FrameGenerator, manifest_url: str):
+        self.frame_generator = frame_generator
+        self.manifest_url = manifest_url
+        # name -> (body, media type, ETag, Cache-Control, extra headers)
+        self._entries: Dict[str, Tuple[bytes, str, str, str, Dict[str, str]]] = {}
+        self._stats = {'served': 0, 'not_modified': 0}
+    
+    def build(self) -> None:
+        """Render and serialize every static frame and the manifest"""
+        generator = self.frame_generator
+        
+        start_html = generator.generate_frame_html(
+            generator.generate_start_frame(),
+            title="🚀 Find Your Crypto Soulmate!"
+        )
+        self._add('start', start_html.encode(), 'text/html; charset=utf-8', FRAME_CACHE_CONTROL)
+        
+        for name, frame in [('info', generator.generate_info_frame()),
+                            ('rate_limit', generator.generate_rate_limit_frame()),
+                            ('no_matches', generator.generate_no_matches_frame())]:
+            self._add(name, self._json(frame), 'application/json', FRAME_CACHE_CONTROL)
+        
+        self._add('manifest', self._json(build_manifest(self.manifest_url)), 'application/json',
+                  MANIFEST_CACHE_CONTROL, {'Access-Control-Allow-Origin': '*'})
+    
+    def response(self, name: str, request: Optional[Request] = None) -> Response:
+        """Serve a prebuilt entry; ETag, Cache-Control and 304s only for a GET/HEAD request"""
+        if not self._entries:
+            self.build()
+        
+        body, media_type, etag, cache_control, headers = self._entries[name]
+        if request is not None:
+            response = cached_response(request, body, media_type, etag, cache_control, headers)
+            if response.status_code == 304:
+                self._stats['not_modified'] += 1
+                return response
+        else:
+            # Frames returned from POST handlers: no validators or Cache-Control
+            response = Response(content=body, media_type=media_type, headers=headers)
+        
+        self._stats['served'] += 1
+        return response
+    
+    def _add(self, name: str, body: bytes, media_type: str, cache_control: str,
+             headers: Optional[Dict[str, str]] = None) -> None:
+        self._entries[name] = (body, media_type, make_etag(body), cache_control, headers or {})
+    
+    @staticmethod
+    def _json(content: Any) -> bytes:
+        # Same serialization as JSONResponse
+        return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(',', ':')).encode('utf-8')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'entries': {name: len(entry[0]) for name, entry in self._entries.items()}
+        }
@@ -0,0 +1,252 @@
+"""
+Comedy Corpus Generator - Pre-generate comedy for every personality pair offline
+
+Enumerates every personality pair (unordered) and score band, asks the LLM for
+several match comments and share lines per key (plus date ideas per pair) with
+bounded concurrency and retry/backoff, and writes the corpus file that
+ComedyGenerator maps at startup (see comedy_corpus.py).
+
+    python generate_corpus.py --variants 5 --concurrency 8
+    python generate_corpus.py --stub          # against a local stub LLM server
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import combinations_with_replacement
+from typing import Dict, Any, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from comedy_cache import SCORE_BANDS, band_score, pair_key
+from comedy_corpus import ComedyCorpus, pair_only_key, write_corpus
+from comedy_generator import ComedyGenerator, SYSTEM_PROMPT
+from personality import PersonalityAnalyzer
+
+# "1. ", "2) ", "- " and similar list markers models put in front of lines
+LIST_MARKER = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s*')
+
+
+def corpus_jobs(analyzer: PersonalityAnalyzer,
+                max_pairs: Optional[int] = None) -> List[Tuple[str, str, Dict[str, Any], Dict[str, Any], int]]:
+    """(kind, key, personality1, personality2, score) for every line set in the corpus"""
+    ids = sorted(analyzer.personality_ids)
+    profiles = {pid: analyzer.build_analysis(pid, {}) for pid in ids}
+    pairs = list(combinations_with_replacement(ids, 2))[:max_pairs]
+    
+    jobs = []
+    for id1, id2 in pairs:
+        p1, p2 = profiles[id1], profiles[id2]
+        jobs.append(('date_idea', pair_only_key(id1, id2), p1, p2, analyzer.calculate_compatibility(id1, id2)))
+        for band in range(len(SCORE_BANDS)):
+            score = band_score(band)
+            for kind in ('comment', 'share'):
+                jobs.append((kind, pair_key(id1, id2, score), p1, p2, score))
+    return jobs
+
+
+def parse_lines(kind: str, text: str, limit: int) -> List[str]:
+    """Usable, distinct lines from a response (share lines must format cleanly)"""
+    lines = []
+    for raw in text.splitlines():
+        line = LIST_MARKER.sub('', raw).strip().strip('"').strip()
+        if not line or line in lines:
+            continue
+        if kind == 'share':
+            if '{username}' not in line:
+                continue
+            try:
+                line.format(username='someone', compatibility=50)
+            except (KeyError, IndexError, ValueError):
+                continue
+        lines.append(line)
+    return lines[:limit]
+
+
+async def generate_lines(client: AsyncOpenAI, args: argparse.Namespace, kind: str, prompt: str,
+                         stats: Dict[str, int]) -> List[str]:
+    """One key's lines, retried with exponential backoff (empty if every attempt failed)"""
+    for attempt in range(args.retries + 1):
+        try:
+            stats['calls'] += 1
+            response = await client.chat.completions.create(
+                model=args.model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=80 * args.variants,
+                temperature=0.9
+            )
+            if response.usage is not None:
+                stats['prompt_tokens'] += response.usage.prompt_tokens
+                stats['completion_tokens'] += response.usage.completion_tokens
+            
+            lines = parse_lines(kind, response.choices[0].message.content or '', args.variants)
+            if not lines:
+                raise ValueError("no usable lines in the response")
+            return lines
+        
+        except Exception as e:
+            if attempt == args.retries:
+                print(f"⚠️  Giving up after {attempt + 1} attempts: {e}")
+                stats['failures'] += 1
+                return []
+            stats['retries'] += 1
+            delay = min(args.max_backoff, args.backoff * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+    return []
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Generate and write the corpus; returns the run report"""
+    stub = None
+    base_url = args.base_url or os.getenv('OPENAI_BASE_URL')
+    api_key = os.getenv('OPENAI_API_KEY')
+    if args.stub:
+        stub = StubLLMServer(latency=args.stub_latency, failure_rate=args.stub_failure_rate)
+        base_url, api_key = stub.start(), 'stub'
+    if not api_key:
+        raise SystemExit("OPENAI_API_KEY is not set (use --stub or --base-url for a local server)")
+    
+    # Retries are ours (with backoff), not the client's
+    client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=args.timeout)
+    generator = ComedyGenerator()
+    jobs = corpus_jobs(PersonalityAnalyzer(), args.pairs)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    stats = {'calls': 0, 'retries': 0, 'failures': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+    
+    async def generate(kind: str, key: str, p1: Dict[str, Any], p2: Dict[str, Any], score: int):
+        prompt = generator.build_prompt(kind, p1, p2, score, count=args.variants)
+        async with semaphore:
+            return (kind, key), await generate_lines(client, args, kind, prompt, stats)
+    
+    print(f"📝 Generating {len(jobs)} line sets x {args.variants} variants "
+          f"(concurrency {args.concurrency}, model {args.model})...")
+    started = time.perf_counter()
+    try:
+        entries = dict(await asyncio.gather(*[generate(*job) for job in jobs]))
+    finally:
+        await client.close()
+        if stub is not None:
+            stub.stop()
+    elapsed = time.perf_counter() - started
+    
+    size = write_corpus(args.output, entries)
+    corpus = ComedyCorpus(args.output)
+    report = {
+        **stats,
+        'keys': len([lines for lines in entries.values() if lines]),
+        'lines': corpus.line_count,
+        'seconds': round(elapsed, 3),
+        'generations_per_sec': round(corpus.line_count / elapsed, 2) if elapsed else 0.0,
+        'calls_per_sec': round(stats['calls'] / elapsed, 2) if elapsed else 0.0,
+        'total_tokens': stats['prompt_tokens'] + stats['completion_tokens'],
+        'bytes': size
+    }
+    corpus.close()
+    
+    print(f"✅ Wrote {args.output} (version {corpus.version}, {report['keys']} keys, "
+          f"{report['lines']} lines, {size / 1024:.1f} KB)")
+    print(f"   {report['generations_per_sec']} generations/sec, {report['calls_per_sec']} calls/sec, "
+          f"{report['retries']} retries, {report['failures']} failed keys")
+    print(f"   Tokens: {report['prompt_tokens']} prompt + {report['completion_tokens']} completion "
+          f"= {report['total_tokens']}")
+    return report
+
+
+class StubLLMServer:
+    """
+    Local OpenAI-compatible chat completions endpoint for testing the job
+    
+    Answers with numbered canned lines (share lines carry the placeholders),
+    after an optional delay, and fails a fraction of requests with 429.
+    """
+    
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def start(self) -> str:
+        """Serve on a free localhost port; returns the base URL"""
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                time.sleep(stub.latency)
+                if random.random() < stub.failure_rate:
+                    self._send(429, {'error': {'message': 'Rate limit reached (stub)', 'type': 'rate_limit'}})
+                    return
+                
+                prompt = request['messages'][-1]['content']
+                count = int((re.search(r'Write (\d+) different options', prompt) or [None, 1])[1])
+                if '{username}' in prompt:
+                    lines = [f"Matched with {{username}} at {{compatibility}}% - stub line {i + 1} 🚀" for i in range(count)]
+                else:
+                    lines = [f"Stub comedy line {i + 1} 😂" for i in range(count)]
+                content = '\n'.join(lines)
+                
+                prompt_tokens = sum(len(m['content'].split()) for m in request['messages'])
+                completion_tokens = len(content.split())
+                self._send(200, {
+                    'id': 'chatcmpl-stub',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'stub'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                              'total_tokens': prompt_tokens + completion_tokens}
+                })
+            
+            def _send(self, status: int, body: Dict[str, Any]):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+    
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pre-generate the comedy corpus for every personality pair")
+    parser.add_argument('--output', default=os.getenv('COMEDY_CORPUS_PATH', 'data/comedy_corpus.bin'))
+    parser.add_argument('--variants', type=int, default=5, help="lines per key")
+    parser.add_argument('--concurrency', type=int, default=8, help="LLM requests in flight")
+    parser.add_argument('--retries', type=int, default=4, help="retries per key after the first attempt")
+    parser.add_argument('--backoff', type=float, default=1.0, help="first retry delay (seconds, doubles)")
+    parser.add_argument('--max-backoff', type=float, default=30.0)
+    parser.add_argument('--timeout', type=float, default=60.0, help="per-request timeout (seconds)")
+    parser.add_argument('--model', default='gpt-4')
+    parser.add_argument('--pairs', type=int, default=None, help="only the first N pairs (smoke runs)")
+    parser.add_argument('--base-url', default=None, help="OpenAI-compatible endpoint (default: OPENAI_BASE_URL)")
+    parser.add_argument('--stub', action='store_true', help="run against a local stub LLM server")
+    parser.add_argument('--stub-latency', type=float, default=0.05)
+    parser.add_argument('--stub-failure-rate', type=float, default=0.0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    report = asyncio.run(run(parse_args()))
+    sys.exit(1 if report['failures'] else 0)
@@ -0,0 +1,71 @@
+"""
+HTTP Cache helpers - ETags, conditional requests and Cache-Control values
+"""
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+# For content whose URL changes whenever the content does
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Only these get validators, Cache-Control and 304s; a POST's response is not a cached representation
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+
+def make_etag(content: bytes) -> str:
+    """Strong ETag derived from the content itself"""
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header matches the ETag (weak comparison, per RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """Conditional GET check: If-None-Match wins; If-Modified-Since only when it is absent"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def cached_response(request: Request, content: bytes, media_type: str, etag: str,
+                    cache_control: str = IMMUTABLE_CACHE_CONTROL,
+                    headers: Optional[Dict[str, str]] = None) -> Response:
+    """200 with validators, or an empty 304 if the client already has this ETag (GET/HEAD only)"""
+    if request.method not in CACHEABLE_METHODS:
+        return Response(content=content, media_type=media_type, headers=headers)
+    
+    response_headers = {'ETag': etag, 'Cache-Control': cache_control, **(headers or {})}
+    
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=response_headers)
+    
+    return Response(content=content, media_type=media_type, headers=response_headers)
@@ -0,0 +1,193 @@
+"""
+Candidate Pool - Precomputed match candidates stored in Postgres
+
+A background pipeline crawls each active user's social graph, analyzes the
+candidates and stores their personality vectors, so find_matches only has to
+read the pool and score it. Stale pools are still served while a refresh runs
+in the background; only a cold miss falls back to the live crawl. An empty
+crawl is never stored (it is usually a failed or rate-limited crawl), and an
+empty stored pool counts as a miss.
+"""
+import asyncio
+import os
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# Profile fields kept with each candidate (everything the match frames show)
+PROFILE_FIELDS = ('fid', 'username', 'display_name', 'pfp_url', 'bio',
+                  'follower_count', 'following_count')
+
+
+class CandidatePool:
+    def __init__(self, matchmaker, database):
+        self.matchmaker = matchmaker
+        self.database = database
+        self.max_age = int(os.getenv('CANDIDATE_POOL_MAX_AGE', 6 * 3600))
+        self.refresh_interval = int(os.getenv('CANDIDATE_POOL_REFRESH_INTERVAL', 300))
+        self.refresh_batch_size = int(os.getenv('CANDIDATE_POOL_REFRESH_BATCH', 50))
+        self.refresh_concurrency = int(os.getenv('CANDIDATE_POOL_REFRESH_CONCURRENCY', 4))
+        self.active_days = int(os.getenv('CANDIDATE_POOL_ACTIVE_DAYS', 7))
+        
+        self._refreshing: Set[int] = set()
+        self._background: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'cold_misses': 0,
+            'empty_skipped': 0,
+            'errors': 0,
+            'refreshes': 0,
+            'refresh_errors': 0
+        }
+    
+    @property
+    def available(self) -> bool:
+        return self.database.pool is not None
+    
+    async def get_candidates(self, user_fid: int) -> Optional[Tuple[List[int], List[Dict[str, Any]]]]:
+        """
+        Candidate FIDs and analyses from the stored pool
+        
+        Returns None on a cold miss or an empty pool (or when the database is
+        unavailable) so the caller can fall back to the live crawl.
+        """
+        if not self.available:
+            return None
+        
+        try:
+            pool = await self.database.get_candidate_pool(user_fid)
+        except Exception as e:
+            print(f"Error reading candidate pool for {user_fid}: {e}")
+            self._stats['errors'] += 1
+            return None
+        
+        if pool is None or not pool['candidates']:
+            self._stats['cold_misses'] += 1
+            return None
+        
+        if pool['age_seconds'] > self.max_age:
+            self._stats['stale_hits'] += 1
+            self.schedule_refresh(user_fid)
+        else:
+            self._stats['hits'] += 1
+        
+        analyzer = self.matchmaker.personality_analyzer
+        fids = []
+        analyses = []
+        for candidate in pool['candidates']:
+            fids.append(candidate['fid'])
+            analyses.append({
+                **candidate['profile'],
+                **analyzer.build_analysis(candidate['personality_type'], candidate['scores'])
+            })
+        
+        return fids, analyses
+    
+    async def store(self, user_fid: int, analyses: Dict[int, Dict[str, Any]]) -> bool:
+        """Persist analyzed candidates as the user's pool (False if there were none)"""
+        if not analyses:
+            self._stats['empty_skipped'] += 1
+            return False
+        
+        await self.database.save_candidate_pool(user_fid, [{
+            'fid': fid,
+            'personality_type': analysis['personality_type'],
+            'scores': analysis['scores'],
+            'profile': {field: analysis.get(field) for field in PROFILE_FIELDS}
+        } for fid, analysis in analyses.items()])
+        return True
+    
+    def schedule_store(self, user_fid: int, analyses: Dict[int, Dict[str, Any]]) -> None:
+        """Write a live crawl's results back as the pool, off the request path"""
+        if self.available:
+            self._spawn(self._store_safely(user_fid, analyses))
+    
+    def schedule_refresh(self, user_fid: int) -> None:
+        """Rebuild a user's pool in the background (deduplicated per user)"""
+        if self.available and user_fid not in self._refreshing:
+            self._refreshing.add(user_fid)
+            self._spawn(self._refresh(user_fid))
+    
+    async def refresh(self, user_fid: int) -> None:
+        """Crawl, analyze and store a fresh candidate pool for one user"""
+        if user_fid in self._refreshing:
+            return
+        
+        self._refreshing.add(user_fid)
+        await self._refresh(user_fid)
+    
+    async def _refresh(self, user_fid: int) -> None:
+        try:
+            analyses = await self.matchmaker.crawl_candidates(user_fid)
+            if await self.store(user_fid, analyses):
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            print(f"Error refreshing candidate pool for {user_fid}: {e}")
+            self._stats['refresh_errors'] += 1
+        finally:
+            self._refreshing.discard(user_fid)
+    
+    async def refresh_stale(self) -> int:
+        """Refresh one batch of stale or missing pools for active users"""
+        user_fids = await self.database.get_stale_candidate_pools(
+            self.max_age,
+            active_days=self.active_days,
+            limit=self.refresh_batch_size
+        )
+        
+        semaphore = asyncio.Semaphore(self.refresh_concurrency)
+        
+        async def refresh_one(fid: int):
+            async with semaphore:
+                await self.refresh(fid)
+        
+        await asyncio.gather(*[refresh_one(fid) for fid in user_fids])
+        return len(user_fids)
+    
+    def start(self) -> None:
+        """Start the periodic background refresh"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the background refresh and wait for pending writes"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+    
+    async def _run(self) -> None:
+        while True:
+            if self.available:
+                try:
+                    refreshed = await self.refresh_stale()
+                    if refreshed:
+                        print(f"♻️  Refreshed {refreshed} candidate pools")
+                except Exception as e:
+                    print(f"Candidate pool refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+    
+    async def _store_safely(self, user_fid: int, analyses: Dict[int, Dict[str, Any]]) -> None:
+        try:
+            await self.store(user_fid, analyses)
+        except Exception as e:
+            print(f"Error storing candidate pool for {user_fid}: {e}")
+            self._stats['errors'] += 1
+    
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'refreshing': len(self._refreshing),
+            'running': self._loop_task is not None
+        }
@@ -0,0 +1,48 @@
+"""
+Match Sessions - The latest find_matches result per user, kept for navigation
+
+Paging, details and share frames read the complete match list (breakdown and
+comedy content included) from here instead of rerunning the match pipeline.
+Sessions live in the in-process LRU and in Redis when connected.
+"""
+import os
+from typing import Dict, Any, List, Optional
+
+from cache import TieredCache
+from redis_store import RedisStore
+
+
+class MatchSessionStore:
+    def __init__(self, redis_store: RedisStore, ttl: Optional[int] = None,
+                 max_entries: Optional[int] = None):
+        self.ttl = ttl or int(os.getenv('MATCH_SESSION_TTL', 1800))
+        self.cache = TieredCache(
+            redis_store,
+            max_entries=max_entries or int(os.getenv('MATCH_SESSION_MAX_ENTRIES', 5000))
+        )
+    
+    @staticmethod
+    def _key(fid: int) -> str:
+        return f'match_session:{fid}'
+    
+    async def save(self, fid: int, matches: List[Dict[str, Any]], limit: int) -> None:
+        """Store a user's match list (limit = how many were asked for)"""
+        await self.cache.set(self._key(fid), {'limit': limit, 'matches': matches}, self.ttl)
+    
+    async def get(self, fid: int, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """The stored matches, or None if there is no session covering limit"""
+        hit, session = await self.cache.get(self._key(fid))
+        if not hit or session is None or session['limit'] < limit:
+            return None
+        return session['matches'][:limit]
+    
+    async def clear(self, fid: int) -> None:
+        await self.cache.delete(self._key(fid))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.cache.get_stats()
+        return {
+            **stats['kinds'].get('match_session', {}),
+            'local_entries': stats['local_entries'],
+            'ttl': self.ttl
+        }
@@ -2,14 +2,20 @@
 Matchmaker AI - Intelligent matching algorithm for crypto compatibility
 """
 import asyncio
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Set, Tuple
 from personality import PersonalityAnalyzer
+from matching_algorithm.scoring import BatchScorer
+from matching_algorithm.candidate_pool import CandidatePool
+from matching_algorithm.match_sessions import MatchSessionStore
 from farcaster_client import FarcasterClient, MockFarcasterClient
 from comedy_generator import ComedyGenerator
+from cache import TieredCache
+from redis_store import redis_store
+from single_flight import SingleFlight
 import os
 
 class MatchmakerAI:
-    def __init__(self, use_mock_data: bool = False):
+    def __init__(self, use_mock_data: bool = False, database=None):
         self.personality_analyzer = PersonalityAnalyzer()
         self.comedy_generator = ComedyGenerator()
         
@@ -18,25 +24,40 @@ class MatchmakerAI:
             self.farcaster_client = MockFarcasterClient()
         else:
             self.farcaster_client = FarcasterClient()
+        
+        # Profile / casts / analysis cache keyed by FID
+        self.cache = TieredCache(
+            redis_store,
+            max_entries=int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 10000))
+        )
+        self.profile_cache_ttl = int(os.getenv('PROFILE_CACHE_TTL', 3600))
+        self.casts_cache_ttl = int(os.getenv('CASTS_CACHE_TTL', 900))
+        self.negative_cache_ttl = int(os.getenv('NEGATIVE_CACHE_TTL', 300))
+        
+        # Vectorized scoring lets us consider far more candidates per request
+        self.scorer = BatchScorer(self.personality_analyzer)
+        self.max_candidates = int(os.getenv('MAX_MATCH_CANDIDATES', 100))
+        
+        # Precomputed candidate pools (needs the database)
+        self.candidate_pool = CandidatePool(self, database) if database is not None else None
+        
+        # Latest match list per user, so frame navigation never recomputes it
+        self.match_sessions = MatchSessionStore(redis_store)
+        
+        # Concurrent requests for the same user share one analysis / match run
+        self.flights = SingleFlight()
     
     async def analyze_user_personality(self, fid: int) -> Dict[str, Any]:
         """Analyze user's crypto personality"""
-        # Get user data from Farcaster
-        user_data = await self.farcaster_client.get_comprehensive_user_data(fid)
+        return await self.flights.do('analysis', f'analysis:{fid}', lambda: self._analyze_user_personality(fid))
+    
+    async def _analyze_user_personality(self, fid: int) -> Dict[str, Any]:
+        analyses = await self.analyze_users_bulk([fid])
         
-        if not user_data:
+        if fid not in analyses:
             raise ValueError(f"Could not fetch data for FID {fid}")
         
-        # Analyze personality
-        personality_analysis = self.personality_analyzer.analyze_user(user_data)
-        
-        # Combine with user data
-        result = {
-            **user_data,
-            **personality_analysis
-        }
-        
-        return result
+        return analyses[fid]
     
     async def find_matches(self, user_fid: int, limit: int = 5) -> List[Dict[str, Any]]:
         """
@@ -49,53 +70,65 @@ class MatchmakerAI:
         Returns:
             List of match dictionaries with compatibility scores
         """
+        return await self.flights.do('matches', f'matches:{user_fid}:{limit}',
+                                     lambda: self._find_matches(user_fid, limit))
+    
+    async def _find_matches(self, user_fid: int, limit: int) -> List[Dict[str, Any]]:
         # Analyze user's personality
         user_analysis = await self.analyze_user_personality(user_fid)
-        user_personality = user_analysis['personality_type']
         
-        # Get potential matches from social graph
+        # Read the precomputed candidate pool; only crawl live on a cold miss
+        pooled = None
+        if self.candidate_pool is not None:
+            pooled = await self.candidate_pool.get_candidates(user_fid)
+        
+        if pooled is not None:
+            scored_fids, scored_analyses = pooled
+        else:
+            candidate_analyses = await self.crawl_candidates(user_fid)
+            if self.candidate_pool is not None:
+                self.candidate_pool.schedule_store(user_fid, candidate_analyses)
+            scored_fids = list(candidate_analyses.keys())
+            scored_analyses = list(candidate_analyses.values())
+        
+        top_matches = self.score_candidates(user_analysis, scored_fids, scored_analyses, limit)
+        
+        # Generate comedy content for all matches concurrently
+        comedy_contents = await self.comedy_generator.generate_match_contents(
+            user_analysis,
+            [(match['match_analysis'], match['compatibility_score']) for match in top_matches]
+        )
+        for match, comedy_content in zip(top_matches, comedy_contents):
+            match['comedy_content'] = comedy_content
+        
+        await self.match_sessions.save(user_fid, top_matches, limit)
+        return top_matches
+    
+    async def get_matches(self, user_fid: int, limit: int = 5) -> List[Dict[str, Any]]:
+        """Matches from the user's session, running find_matches only without one"""
+        matches = await self.match_sessions.get(user_fid, limit)
+        if matches is not None:
+            return matches
+        return await self.find_matches(user_fid, limit=limit)
+    
+    async def crawl_candidates(self, user_fid: int) -> Dict[int, Dict[str, Any]]:
+        """Crawl the social graph live and analyze every candidate (in crawl order)"""
         potential_matches = await self.farcaster_client.get_social_graph_connections(
             user_fid, 
-            depth=2
+            depth=2,
+            target_count=self.max_candidates
         )
         
         if not potential_matches:
             # Fallback to random users if no social connections
             potential_matches = list(range(1000, 1100))
         
-        # Calculate compatibility with each potential match
-        match_scores = []
-        
-        # Process in batches to avoid overwhelming the API
-        batch_size = 20
-        for i in range(0, min(len(potential_matches), 100), batch_size):
-            batch = potential_matches[i:i+batch_size]
-            batch_results = await asyncio.gather(
-                *[self._calculate_match_score(user_analysis, match_fid) 
-                  for match_fid in batch],
-                return_exceptions=True
-            )
-            
-            for result in batch_results:
-                if isinstance(result, dict) and result:
-                    match_scores.append(result)
-        
-        # Sort by compatibility score
-        match_scores.sort(key=lambda x: x['compatibility_score'], reverse=True)
-        
-        # Get top matches
-        top_matches = match_scores[:limit]
-        
-        # Generate comedy content for each match
-        for match in top_matches:
-            comedy_content = await self.comedy_generator.generate_full_match_content(
-                user_analysis,
-                match['match_analysis'],
-                match['compatibility_score']
-            )
-            match['comedy_content'] = comedy_content
+        # Hydrate every candidate with bulk profile fetches
+        candidate_fids = list(dict.fromkeys(potential_matches[:self.max_candidates]))
+        candidate_fids = [fid for fid in candidate_fids if fid != user_fid]
+        candidate_analyses = await self.analyze_users_bulk(candidate_fids)
         
-        return top_matches
+        return {fid: candidate_analyses[fid] for fid in candidate_fids if fid in candidate_analyses}
     
     async def _calculate_match_score(self, user_analysis: Dict[str, Any], 
                                      match_fid: int) -> Dict[str, Any]:
@@ -103,47 +136,80 @@ class MatchmakerAI:
         try:
             # Analyze match's personality
             match_analysis = await self.analyze_user_personality(match_fid)
-            
-            # Calculate base compatibility from personality matrix
-            base_compatibility = self.personality_analyzer.calculate_compatibility(
-                user_analysis['personality_type'],
-                match_analysis['personality_type']
-            )
-            
-            # Calculate trait-based compatibility
-            trait_compatibility = self._calculate_trait_compatibility(
-                user_analysis['traits'],
-                match_analysis['traits']
-            )
-            
-            # Combine scores (70% personality, 30% traits)
-            final_score = int(base_compatibility * 0.7 + trait_compatibility * 0.3)
-            
-            return {
-                'match_fid': match_fid,
-                'match_username': match_analysis.get('username', f'user_{match_fid}'),
-                'match_display_name': match_analysis.get('display_name', ''),
-                'match_pfp_url': match_analysis.get('pfp_url', ''),
-                'compatibility_score': final_score,
-                'match_analysis': match_analysis,
-                'breakdown': {
-                    'personality_match': base_compatibility,
-                    'trait_match': trait_compatibility,
-                    'token_preference_match': self._compare_token_preferences(
-                        user_analysis['scores'],
-                        match_analysis['scores']
-                    ),
-                    'risk_tolerance_match': self._compare_risk_tolerance(
-                        user_analysis['traits'],
-                        match_analysis['traits']
-                    )
-                }
-            }
+            return self._build_match(user_analysis, match_fid, match_analysis)
         
         except Exception as e:
             print(f"Error calculating match score for {match_fid}: {e}")
             return None
     
+    def score_candidates(self, user_analysis: Dict[str, Any], match_fids: List[int],
+                         match_analyses: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Score all analyzed candidates in one vectorized pass and return the top matches"""
+        if not match_analyses:
+            return []
+        
+        scores = self.scorer.score(user_analysis, match_analyses)
+        top = self.scorer.top_k(scores['compatibility_score'], limit)
+        
+        return [
+            self._format_match(
+                match_fids[i],
+                match_analyses[i],
+                int(scores['compatibility_score'][i]),
+                {
+                    'personality_match': int(scores['personality_match'][i]),
+                    'trait_match': int(scores['trait_match'][i]),
+                    'token_preference_match': int(scores['token_preference_match'][i]),
+                    'risk_tolerance_match': int(scores['risk_tolerance_match'][i])
+                }
+            )
+            for i in top
+        ]
+    
+    def _build_match(self, user_analysis: Dict[str, Any], match_fid: int,
+                     match_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Score an already analyzed candidate against the user"""
+        # Calculate base compatibility from personality matrix
+        base_compatibility = self.personality_analyzer.calculate_compatibility(
+            user_analysis['personality_type'],
+            match_analysis['personality_type']
+        )
+        
+        # Calculate trait-based compatibility
+        trait_compatibility = self._calculate_trait_compatibility(
+            user_analysis['traits'],
+            match_analysis['traits']
+        )
+        
+        # Combine scores (70% personality, 30% traits)
+        final_score = int(base_compatibility * 0.7 + trait_compatibility * 0.3)
+        
+        return self._format_match(match_fid, match_analysis, final_score, {
+            'personality_match': base_compatibility,
+            'trait_match': trait_compatibility,
+            'token_preference_match': self._compare_token_preferences(
+                user_analysis['scores'],
+                match_analysis['scores']
+            ),
+            'risk_tolerance_match': self._compare_risk_tolerance(
+                user_analysis['traits'],
+                match_analysis['traits']
+            )
+        })
+    
+    def _format_match(self, match_fid: int, match_analysis: Dict[str, Any],
+                      compatibility_score: int, breakdown: Dict[str, int]) -> Dict[str, Any]:
+        """Build the match dictionary consumed by frames and the database"""
+        return {
+            'match_fid': match_fid,
+            'match_username': match_analysis.get('username', f'user_{match_fid}'),
+            'match_display_name': match_analysis.get('display_name', ''),
+            'match_pfp_url': match_analysis.get('pfp_url', ''),
+            'compatibility_score': compatibility_score,
+            'match_analysis': match_analysis,
+            'breakdown': breakdown
+        }
+    
     def _calculate_trait_compatibility(self, traits1: Dict[str, int], 
                                       traits2: Dict[str, int]) -> int:
         """Calculate compatibility based on trait similarity"""
@@ -236,14 +302,114 @@ class MatchmakerAI:
         
         return match_data
     
-    async def batch_analyze_users(self, fids: List[int]) -> Dict[int, Dict[str, Any]]:
-        """Analyze multiple users in parallel"""
-        results = await asyncio.gather(
-            *[self.analyze_user_personality(fid) for fid in fids],
-            return_exceptions=True
+    async def analyze_users_bulk(self, fids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Analyze many users, hydrating their profiles through the bulk endpoint"""
+        fids = list(dict.fromkeys(fids))
+        cached = await self.cache.get_many([f'analysis:{fid}' for fid in fids])
+        
+        results = {}
+        missing_fids = []
+        for fid in fids:
+            key = f'analysis:{fid}'
+            if key not in cached:
+                missing_fids.append(fid)
+            elif cached[key] is not None:
+                results[fid] = cached[key]
+        
+        if not missing_fids:
+            return results
+        
+        users, failed_fids = await self._get_users_data(missing_fids)
+        
+        found_fids = [fid for fid in missing_fids if users.get(fid)]
+        personality_analyses = self.personality_analyzer.analyze_batch(
+            [users[fid] for fid in found_fids]
         )
         
-        return {
-            fid: result for fid, result in zip(fids, results)
-            if isinstance(result, dict)
+        # Only users the API reported missing are negative-cached; a failed
+        # request says nothing about whether the user exists. Analyses built
+        # without casts because their fetch failed are served but not cached.
+        new_analyses = {f'analysis:{fid}': None for fid in missing_fids if fid not in failed_fids}
+        for fid, personality_analysis in zip(found_fids, personality_analyses):
+            results[fid] = {
+                **users[fid],
+                **personality_analysis
+            }
+            if fid not in failed_fids:
+                new_analyses[f'analysis:{fid}'] = results[fid]
+        
+        await self._cache_results(new_analyses, min(self.profile_cache_ttl, self.casts_cache_ttl))
+        return results
+    
+    async def _get_users_data(self, fids: List[int]) -> Tuple[Dict[int, Dict[str, Any]], Set[int]]:
+        """
+        Profiles plus recent casts for each FID, served from cache where possible
+        
+        Also returns the FIDs whose profile or casts request failed: unknown
+        rather than missing, and not to be cached.
+        """
+        cached = await self.cache.get_many(
+            [f'profile:{fid}' for fid in fids] + [f'casts:{fid}' for fid in fids]
+        )
+        
+        # Profiles: one bulk fetch for everything not cached
+        profiles = {}
+        profile_misses = []
+        failed_fids: Set[int] = set()
+        for fid in fids:
+            key = f'profile:{fid}'
+            if key not in cached:
+                profile_misses.append(fid)
+            elif cached[key] is not None:
+                profiles[fid] = cached[key]
+        
+        if profile_misses:
+            fetched, failed_fids = await self.farcaster_client.fetch_users_bulk(profile_misses)
+            profiles.update(fetched)
+            await self._cache_results(
+                {f'profile:{fid}': fetched.get(fid) for fid in profile_misses if fid not in failed_fids},
+                self.profile_cache_ttl
+            )
+        
+        # Casts: only for users that exist
+        casts = {}
+        cast_misses = []
+        for fid in profiles:
+            key = f'casts:{fid}'
+            if key in cached:
+                casts[fid] = cached[key] or []
+            else:
+                cast_misses.append(fid)
+        
+        if cast_misses:
+            fetched_casts = await asyncio.gather(
+                *[self.farcaster_client.get_user_casts(fid, limit=25) for fid in cast_misses]
+            )
+            succeeded = {}
+            for fid, recent_casts in zip(cast_misses, fetched_casts):
+                if recent_casts is None:
+                    failed_fids.add(fid)
+                else:
+                    succeeded[fid] = recent_casts
+            casts.update(succeeded)
+            await self._cache_results(
+                {f'casts:{fid}': recent_casts for fid, recent_casts in succeeded.items()},
+                self.casts_cache_ttl
+            )
+        
+        users = {
+            fid: {**profile, 'recent_casts': casts.get(fid, [])}
+            for fid, profile in profiles.items()
         }
+        return users, failed_fids
+    
+    async def _cache_results(self, items: Dict[str, Any], ttl: int) -> None:
+        """Write results to the cache; negative entries get the negative TTL"""
+        positive = {key: value for key, value in items.items() if value is not None}
+        negative = {key: None for key, value in items.items() if value is None}
+        await self.cache.set_many(positive, ttl)
+        await self.cache.set_many(negative, self.negative_cache_ttl)
+    
+    async def batch_analyze_users(self, fids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Analyze multiple users in parallel"""
+        return await self.analyze_users_bulk(fids)
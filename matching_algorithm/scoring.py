@@ -0,0 +1,142 @@
+"""
+Batch Scorer - Vectorized compatibility scoring for candidate batches
+
+Mirrors the scalar scoring in MatchmakerAI (_calculate_trait_compatibility,
+_complementary_bonus, _compare_token_preferences, _compare_risk_tolerance and
+the 70/30 blend) using NumPy arrays. Every arithmetic step is evaluated in the
+same order as the scalar code so results are bit-identical.
+"""
+import numpy as np
+from typing import Dict, Any, List
+from personality import PersonalityAnalyzer
+
+# Column order of the packed trait matrix
+TRAIT_KEYS = ('risk_tolerance', 'nft_interest', 'defi_engagement', 'meme_coin_tolerance')
+RISK, NFT, DEFI, MEME = range(len(TRAIT_KEYS))
+
+# Column order of the packed token preference matrix
+TOKEN_KEYS = ('token_preference_btc', 'token_preference_eth')
+
+
+class BatchScorer:
+    def __init__(self, personality_analyzer: PersonalityAnalyzer):
+        self.personality_analyzer = personality_analyzer
+    
+    def pack(self, analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Pack analyses into trait / token preference matrices"""
+        traits = np.array(
+            [[a['traits'].get(key, 50) for key in TRAIT_KEYS] for a in analyses],
+            dtype=np.int64
+        ).reshape(len(analyses), len(TRAIT_KEYS))
+        tokens = np.array(
+            [[a['scores'].get(key, 0) for key in TOKEN_KEYS] for a in analyses],
+            dtype=np.int64
+        ).reshape(len(analyses), len(TOKEN_KEYS))
+        
+        return {
+            'personality_types': [a['personality_type'] for a in analyses],
+            'traits': traits,
+            'tokens': tokens
+        }
+    
+    def score(self, user_analysis: Dict[str, Any],
+              candidate_analyses: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        Score every candidate against the user in one pass
+        
+        Returns:
+            Dictionary of int64 arrays, one entry per candidate:
+            compatibility_score plus every breakdown field
+        """
+        user = self.pack([user_analysis])
+        candidates = self.pack(candidate_analyses)
+        
+        user_traits = user['traits'][0]
+        traits = candidates['traits']
+        
+        personality_match = self._personality_match(
+            user_analysis['personality_type'],
+            candidates['personality_types']
+        )
+        
+        # Trait similarity (same weights / order as _calculate_trait_compatibility)
+        diffs = np.abs(user_traits - traits)
+        sims = 100 - diffs
+        trait_match = (
+            sims[:, RISK] * 0.25 +
+            sims[:, NFT] * 0.20 +
+            sims[:, DEFI] * 0.25 +
+            sims[:, MEME] * 0.20 +
+            self._complementary_bonus(user_traits, traits, diffs) * 0.10
+        )
+        trait_match = np.trunc(trait_match).astype(np.int64)
+        
+        # Token preferences (_compare_token_preferences)
+        token_diffs = np.abs(user['tokens'][0] - candidates['tokens'])
+        token_similarity = 100 - ((token_diffs[:, 0] + token_diffs[:, 1]) / 4)
+        token_preference_match = np.trunc(
+            np.maximum(0, np.minimum(100, token_similarity))
+        ).astype(np.int64)
+        
+        # Risk tolerance (_compare_risk_tolerance)
+        risk_tolerance_match = 100 - diffs[:, RISK]
+        
+        # Combine scores (70% personality, 30% traits)
+        compatibility_score = np.trunc(
+            personality_match * 0.7 + trait_match * 0.3
+        ).astype(np.int64)
+        
+        return {
+            'compatibility_score': compatibility_score,
+            'personality_match': personality_match,
+            'trait_match': trait_match,
+            'token_preference_match': token_preference_match,
+            'risk_tolerance_match': risk_tolerance_match
+        }
+    
+    def _personality_match(self, user_type: str, candidate_types: List[str]) -> np.ndarray:
+        """Base compatibility from the dense personality table"""
+        analyzer = self.personality_analyzer
+        return analyzer.calculate_compatibility_batch(
+            analyzer.get_personality_index(user_type),
+            analyzer.get_personality_indices(candidate_types)
+        )
+    
+    @staticmethod
+    def _complementary_bonus(user_traits: np.ndarray, traits: np.ndarray,
+                             diffs: np.ndarray) -> np.ndarray:
+        """Vectorized MatchmakerAI._complementary_bonus"""
+        bonus = np.full(len(traits), 50, dtype=np.int64)
+        
+        risk_diff = diffs[:, RISK]
+        bonus += np.where((risk_diff >= 20) & (risk_diff <= 40), 20, 0)
+        
+        if user_traits[DEFI] > 70:
+            bonus += np.where(traits[:, DEFI] > 70, 15, 0)
+        
+        if user_traits[NFT] > 70:
+            bonus += np.where(traits[:, NFT] > 70, 15, 0)
+        
+        return np.minimum(bonus, 100)
+    
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices of the k highest scores, best first
+        
+        Uses argpartition to find the cutoff, then orders only the candidates at
+        or above it. Ties keep their original order, matching a stable
+        sort(reverse=True) of the full list.
+        """
+        n = len(scores)
+        if k <= 0 or n == 0:
+            return np.zeros(0, dtype=np.int64)
+        
+        if k < n:
+            cutoff = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            eligible = np.flatnonzero(scores >= cutoff)
+        else:
+            eligible = np.arange(n)
+        
+        order = eligible[np.argsort(-scores[eligible], kind='stable')]
+        return order[:k]
@@ -3,14 +3,92 @@ Personality Analyzer - Determines crypto personality type based on user behavior
 """
 import json
 import random
-from typing import Dict, Any, List, Optional
+import re
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence
 from pathlib import Path
 
+class KeywordScanner:
+    """
+    Single-pass keyword matcher
+    
+    All keywords are compiled into one regex alternation (longest first) with
+    word boundaries, so 'eth' does not match inside 'method' and 'ethereum' is
+    not also counted as 'eth'. Multi-word keywords match any run of whitespace.
+    """
+    
+    def __init__(self, signals: Dict[str, List[str]]):
+        self.signals = list(signals)
+        self._signals_by_keyword: Dict[str, List[str]] = {}
+        for signal, keywords in signals.items():
+            for keyword in keywords:
+                key = ' '.join(keyword.lower().split())
+                self._signals_by_keyword.setdefault(key, []).append(signal)
+        
+        alternation = '|'.join(
+            r'\s+'.join(re.escape(word) for word in keyword.split())
+            for keyword in sorted(self._signals_by_keyword, key=len, reverse=True)
+        )
+        self._pattern = re.compile(rf'(?<!\w)(?:{alternation})(?!\w)')
+    
+    def scan(self, text: str) -> Dict[str, int]:
+        """Count keyword hits per signal in one pass over lowercased text"""
+        counts = dict.fromkeys(self.signals, 0)
+        for match in self._pattern.finditer(text):
+            for signal in self._signals_by_keyword[' '.join(match.group().split())]:
+                counts[signal] += 1
+        return counts
+
+
 class PersonalityAnalyzer:
+    # Traits (and weights) used to classify users into archetypes
+    CLASSIFY_TRAITS = ('risk_tolerance', 'nft_interest', 'defi_engagement', 'meme_coin_tolerance')
+    CLASSIFY_WEIGHTS = (0.25, 0.20, 0.25, 0.20)
+    
     def __init__(self):
         self.personalities = self._load_personalities()
         self.personality_list = self.personalities['personalities']
         self.compatibility_matrix = self.personalities['compatibility_matrix']
+        self._personality_by_id = {p['id']: p for p in self.personality_list}
+        self._compile_compatibility_table()
+        
+        # Archetype trait matrix for batch classification
+        self._archetype_traits = np.array(
+            [[p['traits'][key] for key in self.CLASSIFY_TRAITS] for p in self.personality_list],
+            dtype=np.int64
+        )
+        preferences = [p['traits']['token_preference'] for p in self.personality_list]
+        self._archetype_btc_only = np.array([pref == 'btc_only' for pref in preferences])
+        self._archetype_eth_ecosystem = np.array([pref == 'eth_ecosystem' for pref in preferences])
+        
+        # Keyword -> trait delta table, tunable without code changes
+        keywords = self._load_keywords()
+        self.bio_signals = keywords['bio_signals']
+        self.bio_scanner = KeywordScanner({s['signal']: s['keywords'] for s in self.bio_signals})
+        self.cast_scanner = KeywordScanner(keywords['cast_signals'])
+    
+    def _compile_compatibility_table(self):
+        """
+        Compile the compatibility matrix into a dense integer table
+        
+        Rows/columns follow personality_list order; one extra trailing index
+        (unknown_index) stands for any ID that is not a known personality, so
+        every lookup - including fallbacks - is a single array read.
+        """
+        self.personality_ids = [p['id'] for p in self.personality_list]
+        self.personality_index = {pid: i for i, pid in enumerate(self.personality_ids)}
+        self.unknown_index = len(self.personality_ids)
+        
+        # The unknown slot behaves like an ID missing from the matrix and the list
+        slot_ids = self.personality_ids + [None]
+        size = len(slot_ids)
+        table = np.empty((size, size), dtype=np.int64)
+        for i, p1 in enumerate(slot_ids):
+            for j, p2 in enumerate(slot_ids):
+                table[i, j] = self._compute_compatibility(p1, p2)
+        
+        table.flags.writeable = False
+        self.compatibility_table = table
     
     def _load_personalities(self) -> Dict[str, Any]:
         """Load personality definitions from JSON"""
@@ -18,6 +96,12 @@ class PersonalityAnalyzer:
         with open(personality_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     
+    def _load_keywords(self) -> Dict[str, Any]:
+        """Load keyword signal definitions from JSON"""
+        keyword_file = Path(__file__).parent / 'personality_profiles' / 'keywords.json'
+        with open(keyword_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
     def analyze_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyze user data and determine personality type
@@ -34,15 +118,30 @@ class PersonalityAnalyzer:
         Returns:
             Dictionary with personality analysis
         """
-        # Calculate personality scores based on available data
-        scores = self._calculate_personality_scores(user_data)
+        return self.analyze_batch([user_data])[0]
+    
+    def analyze_batch(self, users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze many users at once
         
-        # Determine best matching personality
-        personality_type = self._determine_personality(scores)
+        Scores every user against every archetype in one matrix operation
+        (weighted trait similarity plus the token preference bonus) and picks
+        the best archetype per row. Results match analyze_user, in input order.
+        """
+        all_scores = [self._calculate_personality_scores(user_data) for user_data in users]
+        best = self._classify(all_scores)
+        
+        return [
+            self.build_analysis(self.personality_ids[index], scores)
+            for scores, index in zip(all_scores, best)
+        ]
+    
+    def build_analysis(self, personality_type: str, scores: Dict[str, int]) -> Dict[str, Any]:
+        """Personality analysis for an already classified user"""
         personality_data = self._get_personality_data(personality_type)
         
         return {
-            'personality_type': personality_type,
+            'personality_type': personality_data['id'],
             'personality_name': personality_data['name'],
             'personality_emoji': personality_data['emoji'],
             'description': personality_data['description'],
@@ -54,6 +153,34 @@ class PersonalityAnalyzer:
             'green_flags': personality_data['green_flags'][:3]
         }
     
+    def _classify(self, all_scores: List[Dict[str, int]]) -> np.ndarray:
+        """Index of the best matching archetype for each score dict"""
+        if not all_scores:
+            return np.zeros(0, dtype=np.int64)
+        
+        user_traits = np.array(
+            [[scores[key] for key in self.CLASSIFY_TRAITS] for scores in all_scores],
+            dtype=np.int64
+        )
+        btc = np.array([scores['token_preference_btc'] for scores in all_scores])
+        eth = np.array([scores['token_preference_eth'] for scores in all_scores])
+        
+        # (users, archetypes, traits) similarity, accumulated in the same
+        # order as _determine_personality so ties resolve identically
+        sims = 100 - np.abs(user_traits[:, None, :] - self._archetype_traits[None, :, :])
+        match_scores = sims[:, :, 0] * self.CLASSIFY_WEIGHTS[0]
+        for t in range(1, len(self.CLASSIFY_TRAITS)):
+            match_scores = match_scores + sims[:, :, t] * self.CLASSIFY_WEIGHTS[t]
+        
+        # Token preference bonus
+        bonus = (
+            (self._archetype_btc_only[None, :] & (btc[:, None] > 70)) |
+            (self._archetype_eth_ecosystem[None, :] & (eth[:, None] > 70))
+        )
+        match_scores = match_scores + np.where(bonus, 10, 0)
+        
+        return np.argmax(match_scores, axis=1)
+    
     def _calculate_personality_scores(self, user_data: Dict[str, Any]) -> Dict[str, int]:
         """Calculate personality trait scores from user data"""
         scores = {
@@ -66,31 +193,14 @@ class PersonalityAnalyzer:
             'token_preference_alt': 40
         }
         
-        # Analyze bio for keywords
+        # Analyze bio for keywords (each signal applies once)
         bio = user_data.get('bio', '').lower()
         if bio:
-            # Bitcoin signals
-            if any(word in bio for word in ['bitcoin', 'btc', 'maxi', 'sound money']):
-                scores['token_preference_btc'] += 30
-                scores['risk_tolerance'] -= 10
-            
-            # Ethereum signals
-            if any(word in bio for word in ['ethereum', 'eth', 'defi', 'smart contract']):
-                scores['token_preference_eth'] += 30
-                scores['defi_engagement'] += 20
-            
-            # NFT signals
-            if any(word in bio for word in ['nft', 'pfp', 'art', 'collector', 'opensea']):
-                scores['nft_interest'] += 30
-            
-            # Meme/shitcoin signals
-            if any(word in bio for word in ['degen', 'ape', 'moon', 'lambo', 'meme']):
-                scores['meme_coin_tolerance'] += 30
-                scores['risk_tolerance'] += 20
-            
-            # Conservative signals
-            if any(word in bio for word in ['hodl', 'long term', 'investor', 'stable']):
-                scores['risk_tolerance'] -= 15
+            bio_counts = self.bio_scanner.scan(bio)
+            for signal in self.bio_signals:
+                if bio_counts[signal['signal']]:
+                    for trait, delta in signal['deltas'].items():
+                        scores[trait] += delta
         
         # Analyze recent casts
         recent_casts = user_data.get('recent_casts', [])
@@ -98,10 +208,11 @@ class PersonalityAnalyzer:
             cast_text = ' '.join([cast.get('text', '').lower() for cast in recent_casts[:20]])
             
             # Count mentions
-            btc_mentions = cast_text.count('btc') + cast_text.count('bitcoin')
-            eth_mentions = cast_text.count('eth') + cast_text.count('ethereum')
-            nft_mentions = cast_text.count('nft')
-            defi_mentions = cast_text.count('defi') + cast_text.count('yield')
+            mentions = self.cast_scanner.scan(cast_text)
+            btc_mentions = mentions['btc']
+            eth_mentions = mentions['eth']
+            nft_mentions = mentions['nft']
+            defi_mentions = mentions['defi']
             
             if btc_mentions > eth_mentions * 2:
                 scores['token_preference_btc'] += 20
@@ -145,7 +256,7 @@ class PersonalityAnalyzer:
         return scores
     
     def _determine_personality(self, scores: Dict[str, int]) -> str:
-        """Determine personality type from scores"""
+        """Determine personality type from scores (scalar reference for _classify)"""
         # Calculate match score for each personality type
         personality_matches = []
         
@@ -186,13 +297,36 @@ class PersonalityAnalyzer:
     
     def _get_personality_data(self, personality_id: str) -> Dict[str, Any]:
         """Get personality data by ID"""
-        for personality in self.personality_list:
-            if personality['id'] == personality_id:
-                return personality
-        return self.personality_list[0]  # Default fallback
+        return self._personality_by_id.get(personality_id, self.personality_list[0])  # Default fallback
+    
+    def get_personality_index(self, personality_id: str) -> int:
+        """Integer index of a personality ID in the compatibility table"""
+        return self.personality_index.get(personality_id, self.unknown_index)
+    
+    def get_personality_indices(self, personality_ids: Sequence[str]) -> np.ndarray:
+        """Integer indices for an array of personality IDs"""
+        index = self.personality_index
+        unknown = self.unknown_index
+        return np.fromiter((index.get(pid, unknown) for pid in personality_ids),
+                           dtype=np.int64, count=len(personality_ids))
     
     def calculate_compatibility(self, personality1: str, personality2: str) -> int:
         """Calculate compatibility score between two personality types"""
+        return int(self.compatibility_table[
+            self.get_personality_index(personality1),
+            self.get_personality_index(personality2)
+        ])
+    
+    def calculate_compatibility_by_index(self, index1: int, index2: int) -> int:
+        """Compatibility score between two personality indices"""
+        return int(self.compatibility_table[index1, index2])
+    
+    def calculate_compatibility_batch(self, indices1, indices2) -> np.ndarray:
+        """Compatibility scores for (broadcastable) arrays of personality indices"""
+        return self.compatibility_table[np.asarray(indices1), np.asarray(indices2)]
+    
+    def _compute_compatibility(self, personality1: Optional[str], personality2: Optional[str]) -> int:
+        """Matrix lookup with trait-similarity fallback (used to build the table)"""
         if personality1 in self.compatibility_matrix:
             if personality2 in self.compatibility_matrix[personality1]:
                 return self.compatibility_matrix[personality1][personality2]
@@ -0,0 +1,151 @@
+"""
+Rate Limiter - Per-FID request limits with pluggable backends
+
+Backends:
+- postgres: one atomic INSERT ... ON CONFLICT ... RETURNING per request (fixed window)
+- redis: sliding window kept in a sorted set, updated by a Lua script
+
+In front of either backend an in-process table remembers FIDs that were just
+rejected, so hot abusers are turned away without any I/O until their window
+frees up.
+"""
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+
+# KEYS[1] = limit key; ARGV = now_ms, window_ms, max_requests, member
+SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    return {count + 1, 0}
+end
+
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {count + 1, tonumber(oldest[2]) + window - now}
+"""
+
+
+class PostgresRateLimitBackend:
+    name = 'postgres'
+    
+    def __init__(self, database):
+        self.database = database
+    
+    async def hit(self, fid: int, max_requests: int, window_seconds: int) -> Tuple[int, float]:
+        """Returns (request count including this one, seconds until a slot frees up)"""
+        return await self.database.hit_rate_limit(fid, max_requests, window_seconds)
+
+
+class RedisRateLimitBackend:
+    name = 'redis'
+    
+    def __init__(self, redis_store, prefix: str = 'cce:ratelimit'):
+        self.redis_store = redis_store
+        self.prefix = prefix
+        self._script = None
+        self._script_client = None
+    
+    async def hit(self, fid: int, max_requests: int, window_seconds: int) -> Tuple[int, float]:
+        """Returns (request count including this one, seconds until a slot frees up)"""
+        client = self.redis_store.client
+        if client is None:
+            raise RuntimeError("Redis rate limit backend selected but Redis is not connected")
+        
+        if self._script is None or self._script_client is not client:
+            self._script = client.register_script(SLIDING_WINDOW_LUA)
+            self._script_client = client
+        
+        count, retry_after_ms = await self._script(
+            keys=[f"{self.prefix}:{fid}"],
+            args=[int(time.time() * 1000), window_seconds * 1000, max_requests, uuid.uuid4().hex]
+        )
+        return int(count), float(retry_after_ms) / 1000
+
+
+class RateLimiter:
+    def __init__(self, backend, max_requests: int = 100, window_seconds: int = 86400,
+                 max_blocked_entries: int = 100000):
+        self.backend = backend
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.max_blocked_entries = max_blocked_entries
+        self._blocked: "OrderedDict[int, float]" = OrderedDict()
+        self._stats = {
+            'checks': 0,
+            'allowed': 0,
+            'rejected': 0,
+            'fast_path_rejections': 0,
+            'backend_errors': 0
+        }
+    
+    async def check(self, fid: int) -> bool:
+        """True if the request is within the limit (counts the request)"""
+        self._stats['checks'] += 1
+        
+        # Fast path: recently rejected FIDs stay rejected until their window frees up
+        blocked_until = self._blocked.get(fid)
+        if blocked_until is not None:
+            if blocked_until > time.monotonic():
+                self._stats['fast_path_rejections'] += 1
+                self._stats['rejected'] += 1
+                return False
+            del self._blocked[fid]
+        
+        try:
+            request_count, retry_after = await self.backend.hit(
+                fid, self.max_requests, self.window_seconds
+            )
+        except Exception:
+            self._stats['backend_errors'] += 1
+            raise
+        
+        if request_count <= self.max_requests:
+            self._stats['allowed'] += 1
+            return True
+        
+        self._block(fid, retry_after)
+        self._stats['rejected'] += 1
+        return False
+    
+    def _block(self, fid: int, retry_after: float) -> None:
+        self._blocked[fid] = time.monotonic() + max(0.0, retry_after)
+        self._blocked.move_to_end(fid)
+        while len(self._blocked) > self.max_blocked_entries:
+            self._blocked.popitem(last=False)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'backend': self.backend.name,
+            'max_requests': self.max_requests,
+            'window_seconds': self.window_seconds,
+            'blocked_fids': len(self._blocked)
+        }
+
+
+def create_rate_limiter(database, redis_store) -> RateLimiter:
+    """Build the rate limiter selected by RATE_LIMIT_BACKEND (postgres | redis)"""
+    backend_name = os.getenv('RATE_LIMIT_BACKEND', 'postgres').lower()
+    if backend_name == 'redis':
+        backend = RedisRateLimitBackend(redis_store)
+    elif backend_name == 'postgres':
+        backend = PostgresRateLimitBackend(database)
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend_name}")
+    
+    return RateLimiter(
+        backend,
+        max_requests=int(os.getenv('MAX_REQUESTS_PER_DAY', 100)),
+        window_seconds=int(os.getenv('RATE_LIMIT_WINDOW_SECONDS', 86400))
+    )
@@ -0,0 +1,45 @@
+"""
+Redis connection handling for Crypto Compatibility Engine
+"""
+import os
+from typing import Optional
+import redis.asyncio as redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class RedisStore:
+    def __init__(self):
+        self.client: Optional[redis.Redis] = None
+        self.host = os.getenv('REDIS_HOST')
+        self.port = int(os.getenv('REDIS_PORT', 6379))
+        self.password = os.getenv('REDIS_PASSWORD') or None
+    
+    async def connect(self):
+        """Open the Redis connection pool"""
+        if not self.host:
+            raise ValueError("REDIS_HOST not set in environment variables")
+        
+        client = redis.Redis(
+            host=self.host,
+            port=self.port,
+            password=self.password,
+            decode_responses=True,
+            socket_timeout=2.0,
+            socket_connect_timeout=2.0
+        )
+        await client.ping()
+        self.client = client
+    
+    async def disconnect(self):
+        """Close the Redis connection pool"""
+        if self.client:
+            await self.client.close()
+            self.client = None
+    
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+# Global Redis instance
+redis_store = RedisStore()
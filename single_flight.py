@@ -0,0 +1,66 @@
+"""
+Single Flight - Coalesce concurrent calls for the same key into one execution
+
+While a call for a key is in flight, later callers await the same task instead
+of starting their own. Counters are kept per kind - a fixed label such as
+"analysis" or a route template, never derived from the key, so the stats
+stay bounded however many keys pass through - plus the keys that were
+coalesced most.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    def __init__(self, max_tracked_keys: int = 1000):
+        self.max_tracked_keys = max_tracked_keys
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._coalesced_keys: "OrderedDict[str, int]" = OrderedDict()
+    
+    def _count(self, kind: str, counter: str) -> None:
+        stats = self._stats.setdefault(kind, {'calls': 0, 'executions': 0, 'coalesced': 0, 'errors': 0})
+        stats[counter] += 1
+    
+    async def do(self, kind: str, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() for key, or join the run already in flight (stats are kept under kind)"""
+        self._count(kind, 'calls')
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count(kind, 'coalesced')
+            self._coalesced_keys[key] = self._coalesced_keys.pop(key, 0) + 1
+            while len(self._coalesced_keys) > self.max_tracked_keys:
+                self._coalesced_keys.popitem(last=False)
+        else:
+            self._count(kind, 'executions')
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(kind, key, done))
+        
+        # Shielded so one caller being cancelled doesn't cancel the others
+        return await asyncio.shield(task)
+    
+    def _finish(self, kind: str, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the exception so it isn't reported as unhandled if every caller left
+        if not task.cancelled() and task.exception() is not None:
+            self._count(kind, 'errors')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        top = sorted(self._coalesced_keys.items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            'in_flight': len(self._inflight),
+            'kinds': {
+                kind: {
+                    **stats,
+                    'coalesce_rate': round(stats['coalesced'] / stats['calls'], 4) if stats['calls'] else 0.0
+                }
+                for kind, stats in self._stats.items()
+            },
+            'top_coalesced_keys': dict(top)
+        }
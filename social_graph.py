@@ -0,0 +1,185 @@
+"""
+Social Graph Crawler - Concurrent, rate limited breadth-first crawl of following lists
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Any, List, Optional, Set
+
+
+class TokenBucket:
+    """Token bucket rate limiter (rate <= 0 disables limiting)"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+    
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        
+        # Created on first use: on Python 3.9 a lock binds to the loop current at construction
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SocialGraphCrawler:
+    """
+    Breadth-first crawl over "following" edges
+    
+    Each level's frontier is fetched concurrently (bounded by a semaphore and a
+    shared token bucket), FIDs are deduplicated across levels, and the crawl
+    stops as soon as target_count candidates have been found.
+    """
+    
+    SAMPLING_STRATEGIES = ('random', 'follower_count', 'mutuals')
+    
+    def __init__(self, client, max_concurrency: Optional[int] = None,
+                 rate_limit: Optional[float] = None):
+        self.client = client
+        self.max_concurrency = max_concurrency or int(os.getenv('GRAPH_CRAWL_CONCURRENCY', 8))
+        self.rate_limiter = TokenBucket(
+            rate_limit if rate_limit is not None else float(os.getenv('GRAPH_CRAWL_RATE', 20))
+        )
+        self.default_fan_out = int(os.getenv('GRAPH_CRAWL_FAN_OUT', 10))
+        self.default_sampling = os.getenv('GRAPH_CRAWL_SAMPLING', 'random')
+        self._stats = {
+            'crawls': 0,
+            'nodes_expanded': 0,
+            'early_stops': 0,
+            'crawl_time_total': 0.0
+        }
+    
+    async def crawl(self, fid: int, depth: int = 2, fan_out: Optional[int] = None,
+                    sampling: Optional[str] = None, target_count: Optional[int] = None,
+                    first_degree_limit: int = 150, next_degree_limit: int = 50) -> List[int]:
+        """
+        Collect candidate FIDs around a user
+        
+        Args:
+            fid: Root user's Farcaster ID
+            depth: 1 = direct following, 2 = following + their following, ...
+            fan_out: Nodes expanded per level beyond the first
+            sampling: 'random', 'follower_count' or 'mutuals'
+            target_count: Stop once this many candidates are found
+            first_degree_limit: Following fetched for the root user
+            next_degree_limit: Following fetched for each sampled node
+        
+        Returns:
+            Candidate FIDs in discovery order (root excluded)
+        """
+        fan_out = fan_out if fan_out is not None else self.default_fan_out
+        sampling = sampling or self.default_sampling
+        if sampling not in self.SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown sampling strategy: {sampling}")
+        
+        started = time.perf_counter()
+        self._stats['crawls'] += 1
+        
+        seen: Set[int] = {fid}
+        candidates: List[int] = []
+        frontier = [fid]
+        mutuals: Optional[Set[int]] = None
+        
+        try:
+            for level in range(depth):
+                if level == 0:
+                    to_expand, limit = frontier, first_degree_limit
+                else:
+                    if sampling == 'mutuals' and mutuals is None:
+                        mutuals = set(await self._fetch(self.client.get_user_followers, fid, first_degree_limit))
+                    to_expand = await self._sample(frontier, fan_out, sampling, mutuals)
+                    limit = next_degree_limit
+                
+                next_frontier = []
+                reached = await self._expand_level(to_expand, limit, seen, candidates,
+                                                   next_frontier, target_count)
+                if reached:
+                    self._stats['early_stops'] += 1
+                    break
+                if not next_frontier:
+                    break
+                frontier = next_frontier
+        finally:
+            self._stats['crawl_time_total'] += time.perf_counter() - started
+        
+        return candidates[:target_count] if target_count else candidates
+    
+    async def _expand_level(self, nodes: List[int], limit: int, seen: Set[int],
+                            candidates: List[int], next_frontier: List[int],
+                            target_count: Optional[int]) -> bool:
+        """Fetch every node's following concurrently; True once the target is reached"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def expand(node: int) -> List[int]:
+            async with semaphore:
+                return await self._fetch(self.client.get_user_following, node, limit)
+        
+        tasks = [asyncio.create_task(expand(node)) for node in nodes]
+        self._stats['nodes_expanded'] += len(tasks)
+        
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                for found in await next_result:
+                    if found in seen:
+                        continue
+                    seen.add(found)
+                    candidates.append(found)
+                    next_frontier.append(found)
+                
+                if target_count and len(candidates) >= target_count:
+                    return True
+            return False
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _fetch(self, method, fid: int, limit: int) -> List[int]:
+        await self.rate_limiter.acquire()
+        return await method(fid, limit=limit)
+    
+    async def _sample(self, frontier: List[int], fan_out: int, sampling: str,
+                      mutuals: Optional[Set[int]]) -> List[int]:
+        """Pick which frontier nodes to expand next"""
+        if len(frontier) <= fan_out:
+            return list(frontier)
+        
+        if sampling == 'follower_count':
+            users = await self.client.get_users_bulk(frontier)
+            return sorted(
+                frontier,
+                key=lambda f: users.get(f, {}).get('follower_count', 0),
+                reverse=True
+            )[:fan_out]
+        
+        if sampling == 'mutuals':
+            preferred = [f for f in frontier if f in mutuals]
+            if len(preferred) >= fan_out:
+                return random.sample(preferred, fan_out)
+            rest = [f for f in frontier if f not in mutuals]
+            return preferred + random.sample(rest, fan_out - len(preferred))
+        
+        return random.sample(frontier, fan_out)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        crawls = self._stats['crawls']
+        return {
+            **self._stats,
+            'avg_crawl_ms': round(self._stats['crawl_time_total'] / crawls * 1000, 3) if crawls else 0.0
+        }
@@ -0,0 +1,230 @@
+"""
+Static Images - Non-blocking, cached serving of static/images
+
+Small files are kept in memory (LRU, bounded by total bytes) and revalidated
+against the file's mtime; large files are streamed from disk instead of being
+read whole. Responses carry ETag/Last-Modified, answer conditional requests
+with 304 and support single byte-range requests.
+"""
+import asyncio
+import mimetypes
+import os
+import time
+from stat import S_ISREG
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from http_cache import http_date, is_not_modified
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ImageFile:
+    path: str
+    size: int
+    mtime_ns: int
+    etag: str
+    last_modified: str
+    media_type: str
+    content: Optional[bytes] = None
+    checked_at: float = 0.0
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into inclusive (start, end)
+    
+    Returns None when the header is absent or should be ignored (multiple
+    ranges, other units, malformed); raises ValueError if unsatisfiable.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    
+    start_text, separator, end_text = header[len('bytes='):].strip().partition('-')
+    if not separator or not (start_text or end_text):
+        return None
+    if (start_text and not start_text.isdigit()) or (end_text and not end_text.isdigit()):
+        return None
+    
+    if not start_text:
+        # Suffix range: the last N bytes
+        length = int(end_text)
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - length), size - 1
+    
+    start = int(start_text)
+    if end_text and int(end_text) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    end = min(int(end_text), size - 1) if end_text else size - 1
+    return start, end
+
+
+class StaticImageCache:
+    def __init__(self, directory: str = 'static/images', max_bytes: Optional[int] = None,
+                 max_file_bytes: Optional[int] = None, recheck_seconds: Optional[float] = None,
+                 cache_control: str = 'public, max-age=3600'):
+        self.directory = os.path.realpath(directory)
+        self.max_bytes = max_bytes or int(os.getenv('STATIC_IMAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        self.max_file_bytes = max_file_bytes or int(os.getenv('STATIC_IMAGE_MAX_FILE_BYTES', 1024 * 1024))
+        # How long a cached file is trusted before its mtime is checked again
+        self.recheck_seconds = recheck_seconds if recheck_seconds is not None else float(
+            os.getenv('STATIC_IMAGE_RECHECK_SECONDS', 1.0)
+        )
+        self.cache_control = cache_control
+        
+        self._files: "OrderedDict[str, ImageFile]" = OrderedDict()
+        self._cached_bytes = 0
+        self._stats = {
+            'memory_hits': 0,
+            'loads': 0,
+            'invalidations': 0,
+            'streamed': 0,
+            'not_modified': 0,
+            'partial': 0,
+            'not_found': 0
+        }
+    
+    def resolve(self, name: str) -> Optional[str]:
+        """Absolute path for an image name, or None if it escapes the directory"""
+        path = os.path.realpath(os.path.join(self.directory, name))
+        if os.path.dirname(path) != self.directory:
+            return None
+        return path
+    
+    async def response(self, request: Request, name: str) -> Response:
+        """Serve an image with caching, validators and range support (404 if missing)"""
+        path = self.resolve(name)
+        image = await self._lookup(path) if path else None
+        if image is None:
+            self._stats['not_found'] += 1
+            return Response(status_code=404)
+        
+        headers = {
+            'ETag': image.etag,
+            'Last-Modified': image.last_modified,
+            'Cache-Control': self.cache_control,
+            'Accept-Ranges': 'bytes'
+        }
+        
+        if is_not_modified(request, image.etag, image.mtime_ns / 1e9):
+            self._stats['not_modified'] += 1
+            return Response(status_code=304, headers=headers)
+        
+        byte_range = None
+        if_range = request.headers.get('if-range')
+        if if_range is None or if_range in (image.etag, image.last_modified):
+            try:
+                byte_range = parse_range(request.headers.get('range'), image.size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{image.size}'})
+        
+        if byte_range is not None:
+            start, end = byte_range
+            self._stats['partial'] += 1
+            headers['Content-Range'] = f'bytes {start}-{end}/{image.size}'
+            headers['Content-Length'] = str(end - start + 1)
+            if image.content is not None:
+                return Response(content=image.content[start:end + 1], status_code=206,
+                                media_type=image.media_type, headers=headers)
+            return StreamingResponse(self._stream(image.path, start, end), status_code=206,
+                                     media_type=image.media_type, headers=headers)
+        
+        if image.content is not None:
+            return Response(content=image.content, media_type=image.media_type, headers=headers)
+        
+        # Large file: let the server stream it from disk (sendfile where supported)
+        self._stats['streamed'] += 1
+        return FileResponse(image.path, media_type=image.media_type, headers=headers)
+    
+    async def _lookup(self, path: str) -> Optional[ImageFile]:
+        cached = self._files.get(path)
+        now = time.monotonic()
+        if cached is not None and now - cached.checked_at < self.recheck_seconds:
+            self._files.move_to_end(path)
+            self._stats['memory_hits'] += 1
+            return cached
+        
+        try:
+            stat = await asyncio.to_thread(os.stat, path)
+        except (FileNotFoundError, NotADirectoryError):
+            self._evict(path)
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+        
+        if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            cached.checked_at = now
+            self._files.move_to_end(path)
+            self._stats['memory_hits'] += 1
+            return cached
+        
+        if cached is not None:
+            self._stats['invalidations'] += 1
+            self._evict(path)
+        
+        image = ImageFile(
+            path=path,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            etag=f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            last_modified=http_date(stat.st_mtime),
+            media_type=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+            checked_at=now
+        )
+        
+        if image.size <= self.max_file_bytes:
+            image.content = await asyncio.to_thread(self._read, path)
+            # The file may have changed between stat and read
+            image.size = len(image.content)
+            self._remember(image)
+        self._stats['loads'] += 1
+        return image
+    
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    async def _stream(self, path: str, start: int, end: int) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, path, 'rb')
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+    
+    def _remember(self, image: ImageFile) -> None:
+        if image.size > self.max_bytes:
+            return
+        self._files[image.path] = image
+        self._cached_bytes += image.size
+        while self._cached_bytes > self.max_bytes:
+            _, evicted = self._files.popitem(last=False)
+            self._cached_bytes -= evicted.size
+    
+    def _evict(self, path: str) -> None:
+        image = self._files.pop(path, None)
+        if image is not None:
+            self._cached_bytes -= image.size
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            'cached_files': len(self._files),
+            'cached_bytes': self._cached_bytes,
+            'max_bytes': self.max_bytes
+        }